@@ -0,0 +1,69 @@
+import mimetypes
+import os
+import threading
+from collections import namedtuple
+from email.base64mime import body_encode
+from email.mime.base import MIMEBase
+
+# A static attachment read and base64-encoded once
+CachedAttachment = namedtuple(
+    "CachedAttachment", ["filename", "maintype", "subtype", "encoded"]
+)
+
+
+class AttachmentCache:
+    """Load and base64-encode static attachments once for every message
+
+    Entries are keyed by path, modification time and size, so editing a
+    file between runs (or during one) picks up the new contents.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, path):
+        """Return the CachedAttachment for a file, or None if it is missing"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._load(path)
+                    # Drop entries for older versions of the same file
+                    for old_key in [k for k in self._entries if k[0] == key[0]]:
+                        del self._entries[old_key]
+                    self._entries[key] = entry
+        return entry
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        self.loads += 1
+
+        content_type, _ = mimetypes.guess_type(path)
+        maintype, subtype = (content_type or "application/octet-stream").split("/")
+        return CachedAttachment(
+            os.path.basename(path), maintype, subtype, body_encode(data)
+        )
+
+    def mime_part(self, path):
+        """Build a MIME attachment part from the cached encoded payload"""
+        entry = self.get(path)
+        if entry is None:
+            return None
+
+        part = MIMEBase(entry.maintype, entry.subtype)
+        part.set_payload(entry.encoded)
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header(
+            "Content-Disposition", f"attachment; filename= {entry.filename}"
+        )
+        return part
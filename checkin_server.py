@@ -0,0 +1,408 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import statistics
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from dotenv import load_dotenv
+
+from sheet_writer import SheetWriteBuffer
+
+# Load environment variables from .env.local
+load_dotenv(".env.local")
+
+# The service only listens on this machine unless told otherwise
+CHECKIN_HOST = os.getenv("CHECKIN_HOST", "127.0.0.1")
+CHECKIN_PORT = int(os.getenv("CHECKIN_PORT", "8080"))
+# Check-ins are written back to the sheet this often
+CHECKIN_SYNC_SECONDS = float(os.getenv("CHECKIN_SYNC_SECONDS", "5"))
+CHECKIN_COLUMN = "checked_in_at"
+
+
+class Attendee:
+    """One participant in the check-in index"""
+
+    __slots__ = ("row", "name", "email", "checked_in_at", "scans")
+
+    def __init__(self, row, name, email, checked_in_at=""):
+        self.row = row
+        self.name = name
+        self.email = email
+        self.checked_in_at = checked_in_at
+        self.scans = 0
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "email": self.email,
+            "checked_in_at": self.checked_in_at or None,
+            "scans": self.scans,
+        }
+
+
+class CheckinIndex:
+    """Every unique_id held in a dict for constant time door lookups
+
+    Check-ins are recorded in memory immediately and queued for a
+    background thread that writes them to the participant source's
+    checked_in_at column in batches, so a slow sheet never holds up the
+    queue at the door. Repeated scans of a checked-in code are counted as
+    duplicates and keep the first check-in time. With `verify` set, codes
+    it rejects (e.g. signed IDs with a bad tag) are refused as forged
+    before they are looked up.
+    """
+
+    def __init__(
+        self, attendees, source=None, column=None, sync_interval=None, verify=None
+    ):
+        self.attendees = attendees
+        self.source = source
+        self.column = column
+        self.sync_interval = sync_interval or CHECKIN_SYNC_SECONDS
+        self.verify = verify
+        self.checked_in = sum(1 for a in attendees.values() if a.checked_in_at)
+        self.duplicates = 0
+        self.unknown = 0
+        self.forged = 0
+        self.synced = 0
+
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._stopped = threading.Event()
+        self._sync_thread = None
+
+    @classmethod
+    def load(cls, source):
+        """Index a ParticipantSource, adding the checked_in_at column
+
+        With ID_FORMAT=signed every scanned code must carry a valid tag.
+        """
+        from generate_uniqueId import ID_FORMAT, verify_signed_id
+
+        headers = source.headers
+        for name in ("unique_id", "name", "email"):
+            if name not in headers:
+                raise ValueError(f"'{name}' column not found!")
+        column = source.ensure_column(CHECKIN_COLUMN)
+        uid_col = headers.index("unique_id")
+        name_col = headers.index("name")
+        email_col = headers.index("email")
+
+        attendees = {}
+        for row, values in source.iter_rows():
+            unique_id = _value(values, uid_col).strip()
+            if unique_id:
+                attendees[unique_id] = Attendee(
+                    row,
+                    _value(values, name_col),
+                    _value(values, email_col),
+                    _value(values, column - 1),
+                )
+        verify = verify_signed_id if ID_FORMAT == "signed" else None
+        return cls(attendees, source, column, verify=verify)
+
+    @classmethod
+    def from_ids(cls, unique_ids):
+        """Index bare IDs with nothing to sync to, e.g. for load tests"""
+        attendees = {
+            unique_id: Attendee(row, f"Guest {row}", "")
+            for row, unique_id in enumerate(unique_ids, start=2)
+        }
+        return cls(attendees)
+
+    def _is_forged(self, unique_id):
+        if self.verify is None or self.verify(unique_id):
+            return False
+        with self._lock:
+            self.forged += 1
+        return True
+
+    def validate(self, unique_id):
+        """Look a code up without checking it in"""
+        if self._is_forged(unique_id):
+            return {"status": "forged", "unique_id": unique_id}
+        attendee = self.attendees.get(unique_id)
+        if attendee is None:
+            return {"status": "unknown", "unique_id": unique_id}
+        status = "checked_in" if attendee.checked_in_at else "valid"
+        return dict(attendee.as_dict(), status=status, unique_id=unique_id)
+
+    def check_in(self, unique_id):
+        """Check a code in; repeated scans are reported as duplicates"""
+        if self._is_forged(unique_id):
+            return {"status": "forged", "unique_id": unique_id}
+        attendee = self.attendees.get(unique_id)
+        with self._lock:
+            if attendee is None:
+                self.unknown += 1
+                return {"status": "unknown", "unique_id": unique_id}
+
+            attendee.scans += 1
+            if attendee.checked_in_at:
+                self.duplicates += 1
+                status = "duplicate"
+            else:
+                attendee.checked_in_at = datetime.now().isoformat(timespec="seconds")
+                self.checked_in += 1
+                status = "ok"
+                if self.source is not None:
+                    self._pending.put((attendee.row, attendee.checked_in_at))
+            return dict(attendee.as_dict(), status=status, unique_id=unique_id)
+
+    def stats(self):
+        return {
+            "attendees": len(self.attendees),
+            "checked_in": self.checked_in,
+            "duplicates": self.duplicates,
+            "unknown": self.unknown,
+            "forged": self.forged,
+            "pending_sync": self._pending.qsize(),
+            "synced": self.synced,
+        }
+
+    def start_sync(self):
+        """Start writing check-ins back to the source in the background"""
+        if self.source is None or self._sync_thread is not None:
+            return
+        self._sync_thread = threading.Thread(target=self._sync_loop, daemon=True)
+        self._sync_thread.start()
+
+    def _sync_loop(self):
+        writer = SheetWriteBuffer(
+            self.source, flush_every=float("inf"), flush_interval=float("inf")
+        )
+        while not self._stopped.wait(self.sync_interval):
+            self._sync(writer)
+        self._sync(writer)
+
+    def _sync(self, writer):
+        rows = 0
+        while True:
+            try:
+                row, checked_in_at = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            writer.set(row, self.column, checked_in_at)
+            rows += 1
+        if not rows and not writer.pending_count:
+            return
+        try:
+            writer.flush()
+            self.source.commit()
+            self.synced += rows
+            print(f"📝 Synced {rows} check-in(s) to the sheet")
+        except Exception as e:
+            # The writer keeps the cells, so the next sync retries them
+            print(f"Error: Could not sync check-ins: {str(e)}")
+
+    def stop_sync(self):
+        """Write any remaining check-ins and stop the sync thread"""
+        self._stopped.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join()
+            self._sync_thread = None
+
+
+def _value(values, index):
+    return values[index] if index < len(values) else ""
+
+
+# HTTP status for lookups that did not find a valid code
+LOOKUP_STATUS_CODES = {"unknown": 404, "forged": 403}
+
+
+class CheckinHandler(BaseHTTPRequestHandler):
+    """JSON API: GET /validate/<id>, POST /checkin/<id>, GET /stats"""
+
+    # Keep connections open so scanners do not reconnect for every code
+    protocol_version = "HTTP/1.1"
+    # Replies are tiny; do not let Nagle hold them back waiting for an ACK
+    disable_nagle_algorithm = True
+    index = None
+    quiet = False
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.index.stats())
+        elif self.path.startswith("/validate/"):
+            self._lookup(self.index.validate, "/validate/")
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        # Discard any request body so the connection can be reused
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.path.startswith("/checkin/"):
+            result = self._lookup(self.index.check_in, "/checkin/")
+            if not self.quiet:
+                _print_checkin(result)
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def _lookup(self, func, prefix):
+        unique_id = unquote(self.path[len(prefix) :]).strip()
+        result = func(unique_id)
+        self._reply(LOOKUP_STATUS_CODES.get(result["status"], 200), result)
+        return result
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Check-ins are printed by do_POST; skip the access log
+        pass
+
+
+def _print_checkin(result):
+    if result["status"] == "ok":
+        print(f"✓ Checked in: {result['name']} ({result['unique_id']})")
+    elif result["status"] == "duplicate":
+        print(
+            f"⚠️  Already checked in at {result['checked_in_at']}: "
+            f"{result['name']} (scan #{result['scans']})"
+        )
+    elif result["status"] == "forged":
+        print(f"✗ Invalid signature: {result['unique_id']}")
+    else:
+        print(f"✗ Unknown code: {result['unique_id']}")
+
+
+def create_server(index, host=None, port=None, quiet=False):
+    """Create an HTTP server answering check-in requests from `index`"""
+    handler = type(
+        "BoundCheckinHandler", (CheckinHandler,), {"index": index, "quiet": quiet}
+    )
+    server = ThreadingHTTPServer(
+        (host or CHECKIN_HOST, CHECKIN_PORT if port is None else port), handler
+    )
+    server.daemon_threads = True
+    return server
+
+
+def run_checkin_server(host=None, port=None):
+    """Index the participant list and serve check-ins until Ctrl-C"""
+    from participant_source import open_participant_source
+
+    try:
+        print("Loading participants...")
+        start = time.perf_counter()
+        index = CheckinIndex.load(open_participant_source())
+        print(
+            f"✓ Indexed {len(index.attendees)} codes in "
+            f"{time.perf_counter() - start:.2f}s "
+            f"({index.checked_in} already checked in)"
+        )
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return
+
+    server = create_server(index, host, port)
+    index.start_sync()
+    host, port = server.server_address[:2]
+    print(f"🚪 Check-in service on http://{host}:{port}")
+    print("   GET /validate/<id>  POST /checkin/<id>  GET /stats  (Ctrl-C stops)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹ Stopping check-in service...")
+    finally:
+        server.server_close()
+        index.stop_sync()
+        print(f"📊 {index.stats()}")
+
+
+def load_test(count=20000, threads=8, attendees=5000):
+    """Drive lookups at an in-process server and print throughput/latency
+
+    Each thread keeps one HTTP connection open and alternates validate and
+    check-in requests over known codes, with one in 100 unknown;
+    nothing is written to the sheet.
+    """
+    from generate_uniqueId import generate_unique_ids
+
+    unique_ids = generate_unique_ids(attendees, "uuid4")
+    index = CheckinIndex.from_ids(unique_ids)
+
+    start = time.perf_counter()
+    for position in range(count):
+        index.validate(unique_ids[position % attendees])
+    in_memory = count / (time.perf_counter() - start)
+
+    server = create_server(index, "127.0.0.1", 0, quiet=True)
+    host, port = server.server_address[:2]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    per_thread = max(1, count // threads)
+    latencies = [[] for _ in range(threads)]
+
+    def client(worker):
+        conn = http.client.HTTPConnection(host, port)
+        for position in range(per_thread):
+            number = worker * per_thread + position
+            unique_id = unique_ids[number % attendees]
+            if number % 100 == 1:
+                unique_id = "not-a-real-code"
+            method, path = (
+                ("POST", "/checkin/") if number % 2 else ("GET", "/validate/")
+            )
+            sent = time.perf_counter()
+            conn.request(method, path + unique_id)
+            conn.getresponse().read()
+            latencies[worker].append(time.perf_counter() - sent)
+        conn.close()
+
+    workers = [
+        threading.Thread(target=client, args=(worker,)) for worker in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    ordered = sorted(latency for worker in latencies for latency in worker)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"In-memory index: {in_memory:,.0f} lookups/sec")
+    print(
+        f"HTTP ({threads} connections): {len(ordered) / elapsed:,.0f} requests/sec; "
+        f"latency mean {statistics.mean(ordered) * 1000:.2f} ms, "
+        f"p99 {p99 * 1000:.2f} ms"
+    )
+    print(f"Index after test: {index.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Door check-in service")
+    parser.add_argument("--host", default=CHECKIN_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=CHECKIN_PORT, help="port")
+    parser.add_argument(
+        "--load-test",
+        type=int,
+        metavar="N",
+        help="send N requests to an in-process server with fake codes, then exit",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=8, help="client threads for --load-test"
+    )
+    args = parser.parse_args()
+
+    if args.load_test:
+        load_test(args.load_test, args.threads)
+    else:
+        run_checkin_server(args.host, args.port)
@@ -0,0 +1,106 @@
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from retry_queue import RetryQueue, classify_error
+
+# One email to send; `row` is the 1-based sheet row it came from and
+# `fields` maps column names to that row's values
+SendJob = namedtuple(
+    "SendJob",
+    ["index", "row", "recipient_email", "name", "unique_id", "fields"],
+    defaults=(None,),
+)
+
+# Final outcome of a SendJob; `error` is None when the message was accepted
+# and `category` says what kind of failure it was otherwise
+SendResult = namedtuple(
+    "SendResult",
+    ["job", "success", "error", "attempts", "category"],
+    defaults=(1, None),
+)
+
+
+class EmailDispatcher:
+    """Fan send jobs out over a bounded pool of worker threads
+
+    `send` is called with a SendJob and must raise on failure. Each worker
+    borrows its own SMTP session from the pool passed to `send`, so the
+    number of workers should not exceed the pool size.
+
+    With a RetryPolicy, failures it considers retryable are parked in a
+    RetryQueue for their backoff delay while other jobs keep flowing, and
+    only each job's final result is yielded.
+    """
+
+    def __init__(self, send, workers=1, max_pending=None, retry_policy=None):
+        self.send = send
+        self.workers = max(1, workers)
+        # Bound the jobs queued ahead of the workers so memory stays flat
+        self.max_pending = max_pending or self.workers * 2
+        self.retry_policy = retry_policy
+        self.retries = 0
+
+    def _run(self, job, attempts):
+        try:
+            self.send(job)
+            return SendResult(job, True, None, attempts)
+        except Exception as e:
+            return SendResult(job, False, e, attempts, classify_error(e))
+
+    def dispatch(self, jobs):
+        """Send every job, yielding a SendResult for each as it completes"""
+        jobs = iter(jobs)
+        retry_queue = RetryQueue()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            exhausted = False
+            try:
+                while pending or retry_queue or not exhausted:
+                    # Jobs whose backoff has passed go ahead of new ones
+                    while len(pending) < self.max_pending:
+                        retry = retry_queue.pop_ready()
+                        if retry is not None:
+                            job, attempts = retry
+                        elif not exhausted:
+                            job, attempts = next(jobs, None), 0
+                            if job is None:
+                                exhausted = True
+                                continue
+                        else:
+                            break
+                        pending.add(executor.submit(self._run, job, attempts + 1))
+
+                    if not pending:
+                        # Only backed-off jobs are left; wait for the first
+                        time.sleep(retry_queue.seconds_until_ready() or 0)
+                        continue
+
+                    done, pending = wait(
+                        pending,
+                        timeout=retry_queue.seconds_until_ready(),
+                        return_when=FIRST_COMPLETED,
+                    )
+                    for future in sorted(done, key=lambda f: f.result().job.index):
+                        result = future.result()
+                        if not result.success and self._should_retry(result):
+                            self.retries += 1
+                            retry_queue.push(
+                                (result.job, result.attempts),
+                                self.retry_policy.delay(result.attempts),
+                            )
+                        else:
+                            yield result
+            finally:
+                # Stop queued jobs if the caller bails out early
+                for future in pending:
+                    future.cancel()
+
+    def _should_retry(self, result):
+        return self.retry_policy is not None and self.retry_policy.should_retry(
+            result.category, result.attempts
+        )
+
+    def dispatch_all(self, jobs):
+        """Send every job and return the results ordered like the jobs"""
+        return sorted(self.dispatch(jobs), key=lambda result: result.job.index)
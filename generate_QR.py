@@ -1,7 +1,29 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
 import qrcode
 import gspread
+from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
-import os
+from PIL import ImageColor
+
+from generate_uniqueId import short_key
+from participant_source import open_configured_file_source
+from participant_table import ParticipantTable
+from png_writer import encode_png
+from vector_writer import encode_pdf, encode_svg
+from sheets_client import instrument_client, metrics as sheets_metrics
+
+load_dotenv(".env.local")
 
 # Setup Google Sheets authentication
 SCOPES = [
@@ -12,12 +34,38 @@ CREDENTIALS_FILE = "credentials.json"
 SPREADSHEET_NAME = "Spave8: Qr Codes"  # Change to your spreadsheet name
 SHEET_NAME = "Sheet1"  # Change to your sheet name if different
 OUTPUT_DIR = "qr_codes"  # Directory to save QR codes
+QR_WORKERS = int(os.getenv("QR_WORKERS") or os.cpu_count() or 1)  # Render processes
+MANIFEST_FILE = "manifest.json"  # Tracks rendered codes inside OUTPUT_DIR
+# PNG encoder: "raw" writes 1-bit PNGs straight from the module matrix,
+# "pil" draws them with qrcode's PIL image factory
+QR_BACKEND = os.getenv("QR_BACKEND", "raw").strip().lower()
+QR_BACKENDS = ("raw", "pil")
+# Output format of the code files, and the MIME type each is emailed as
+QR_FORMAT = os.getenv("QR_FORMAT", "png").strip().lower()
+QR_FORMATS = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+
+# Render settings; changing any of them re-renders every code
+QR_SETTINGS = {
+    "version": 1,
+    "error_correction": "M",
+    "box_size": 10,
+    "border": 2,
+    "fill_color": "black",
+    "back_color": "white",
+    "backend": QR_BACKEND,
+}
+ERROR_CORRECTION_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
 
 
 def authenticate_google_sheets():
-    """Authenticate and return Google Sheets client"""
+    """Authenticate and return a quota-aware Google Sheets client"""
     creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    return gspread.authorize(creds)
+    return instrument_client(gspread.authorize(creds))
 
 
 def create_output_directory():
@@ -27,72 +75,465 @@ def create_output_directory():
         print(f"Created directory: {OUTPUT_DIR}")
 
 
-def generate_qr_code(data, filename):
-    """Generate QR code and save as image"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_M,
-        box_size=10,
-        border=2,
+def qr_filename(unique_id, output_format=None):
+    """Return the image filename used for a unique ID"""
+    # The short key is unique within the sheet
+    return f"qr_{short_key(unique_id)}.{output_format or QR_FORMAT}"
+
+
+def find_qr_file(unique_id, output_dir=None, output_format=None):
+    """Return the path of a unique ID's saved QR code, or None
+
+    Without `output_format`, QR_FORMAT is tried first and then the other
+    formats, so codes rendered with a different format are found too.
+    """
+    formats = [output_format] if output_format else [QR_FORMAT] + list(QR_FORMATS)
+    for fmt in dict.fromkeys(formats):
+        path = os.path.join(output_dir or OUTPUT_DIR, qr_filename(unique_id, fmt))
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class QRRenderer:
+    """Reusable QR encoder with the version and mask pattern fitted once
+
+    qrcode's make(fit=True) searches for the smallest version and scores
+    all eight mask patterns for every code. IDs of one format all have the
+    same length, so the renderer fits a sample of that length once, pins
+    the version and mask, and reuses a single QRCode object; each code is
+    then only encoded. Data that overflows the pinned version gets a fit
+    of its own. The sample is fixed, so every process and every run picks
+    the same parameters and renders identical images.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or QR_SETTINGS
+        self.backend = self.settings.get("backend", "pil")
+        if self.backend not in QR_BACKENDS:
+            raise ValueError(
+                f"Unknown QR_BACKEND '{self.backend}' (use {' or '.join(QR_BACKENDS)})"
+            )
+        self.output_format = self.settings.get("format", "png")
+        if self.output_format not in QR_FORMATS:
+            raise ValueError(
+                f"Unknown QR_FORMAT '{self.output_format}' "
+                f"(use {', '.join(QR_FORMATS)})"
+            )
+        self._colors = [
+            ImageColor.getrgb(self.settings[key])[:3]
+            for key in ("fill_color", "back_color")
+        ]
+        self.fits = 0
+        self._params = {}  # encoded length -> (version, mask_pattern)
+        self._qr = self._new_qr()
+
+    def _new_qr(self):
+        return qrcode.QRCode(
+            version=self.settings["version"],
+            error_correction=ERROR_CORRECTION_LEVELS[self.settings["error_correction"]],
+            box_size=self.settings["box_size"],
+            border=self.settings["border"],
+        )
+
+    def _fit(self, data):
+        qr = self._new_qr()
+        qr.add_data(data)
+        qr.best_fit(start=qr.version)
+        self.fits += 1
+        return qr.version, qr.best_mask_pattern()
+
+    def params(self, data):
+        """(version, mask_pattern) pinned for data of this length"""
+        length = len(data.encode("utf-8") if isinstance(data, str) else data)
+        if length not in self._params:
+            # Byte mode needs the most space, so any ID this long fits
+            self._params[length] = self._fit("x" * length)
+        return self._params[length]
+
+    def encode(self, data):
+        """The reused QRCode object holding `data`"""
+        qr = self._qr
+        qr.clear()
+        qr.version, qr.mask_pattern = self.params(data)
+        qr.add_data(data)
+        try:
+            qr.make(fit=False)
+        except qrcode.exceptions.DataOverflowError:
+            qr.clear()
+            qr.version, qr.mask_pattern = self._fit(data)
+            qr.add_data(data)
+            qr.make(fit=False)
+        return qr
+
+    def make_image(self, data):
+        return self.encode(data).make_image(
+            fill_color=self.settings["fill_color"],
+            back_color=self.settings["back_color"],
+        )
+
+    def render_png(self, data):
+        """Render a QR code to PNG bytes in memory"""
+        if self.backend == "raw":
+            return encode_png(
+                self.encode(data).get_matrix(),
+                self.settings["box_size"],
+                *self._colors,
+            )
+        buffer = io.BytesIO()
+        self.make_image(data).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def render(self, data):
+        """Render a QR code to bytes in the renderer's output format"""
+        if self.output_format == "png":
+            return self.render_png(data)
+        encode = encode_svg if self.output_format == "svg" else encode_pdf
+        return encode(
+            self.encode(data).get_matrix(), self.settings["box_size"], *self._colors
+        )
+
+    def save(self, data, filepath):
+        with open(filepath, "wb") as f:
+            f.write(self.render(data))
+        return filepath
+
+
+# Renderers reuse one mutable QRCode object, so each thread gets its own
+_renderers = threading.local()
+
+
+def get_renderer(backend=None, output_format=None):
+    """This thread's shared QRRenderer (default QR_BACKEND and QR_FORMAT)"""
+    key = (backend or QR_SETTINGS["backend"], output_format or QR_FORMAT)
+    cache = getattr(_renderers, "cache", None)
+    if cache is None:
+        cache = _renderers.cache = {}
+    if key not in cache:
+        cache[key] = QRRenderer(dict(QR_SETTINGS, backend=key[0], format=key[1]))
+    return cache[key]
+
+
+def render_qr_png(data):
+    """Render a QR code to PNG bytes in memory"""
+    return get_renderer(output_format="png").render_png(data)
+
+
+def render_qr(data, output_format=None):
+    """Render a QR code in memory, as QR_FORMAT unless given"""
+    return get_renderer(output_format=output_format).render(data)
+
+
+def generate_qr_code(data, filename, output_dir=None, backend=None, output_format=None):
+    """Generate QR code and save as image
+
+    The output format defaults to the filename's extension, then QR_FORMAT;
+    `backend` selects the PNG encoder.
+    """
+    if output_format is None:
+        extension = os.path.splitext(filename)[1].lstrip(".").lower()
+        output_format = extension if extension in QR_FORMATS else None
+    filepath = os.path.join(output_dir or OUTPUT_DIR, filename)
+    return get_renderer(backend, output_format).save(data, filepath)
+
+
+def content_hash(data):
+    """Hash of everything that determines a code's image"""
+    payload = json.dumps([data, QR_SETTINGS], sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def load_manifest(output_dir=None):
+    """Load the unique_id -> rendered code manifest, or an empty one"""
+    path = os.path.join(output_dir or OUTPUT_DIR, MANIFEST_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("codes", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(codes, output_dir=None):
+    """Atomically write the manifest next to the images"""
+    path = os.path.join(output_dir or OUTPUT_DIR, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"codes": codes}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_incremental(unique_ids, manifest, output_dir=None, output_format=None):
+    """Split unique IDs into codes to render and codes already up to date
+
+    A code is up to date when the manifest has the same content hash for
+    it and its image is still on disk in the requested format.
+    """
+    output_dir = output_dir or OUTPUT_DIR
+    to_render = []
+    unchanged = 0
+    for unique_id in unique_ids:
+        filename = qr_filename(unique_id, output_format)
+        entry = manifest.get(unique_id)
+        if (
+            entry
+            and entry.get("hash") == content_hash(unique_id)
+            and entry.get("filename") == filename
+            and os.path.exists(os.path.join(output_dir, filename))
+        ):
+            unchanged += 1
+        else:
+            to_render.append((unique_id, filename))
+    return to_render, unchanged
+
+
+def prune_orphans(manifest, unique_ids, output_dir=None, output_format=None):
+    """Delete images for IDs no longer in the sheet; returns their filenames"""
+    output_dir = output_dir or OUTPUT_DIR
+    live_ids = set(unique_ids)
+    live_files = {qr_filename(unique_id, output_format) for unique_id in live_ids}
+    removed = []
+    for unique_id in [uid for uid in manifest if uid not in live_ids]:
+        filename = manifest.pop(unique_id)["filename"]
+        if filename not in live_files:
+            try:
+                os.remove(os.path.join(output_dir, filename))
+            except FileNotFoundError:
+                pass
+            removed.append(filename)
+    return removed
+
+
+def _render_chunk(chunk, output_dir):
+    """Render a list of (data, filename) pairs, timing each image"""
+    results = []
+    for data, filename in chunk:
+        start = time.perf_counter()
+        generate_qr_code(data, filename, output_dir)
+        results.append((filename, time.perf_counter() - start))
+    return results
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def generate_qr_codes(items, workers=None, output_dir=None, on_done=None):
+    """Render many (data, filename) pairs, in parallel when workers > 1
+
+    Work is split into chunks so each process handles many images per
+    round trip. `on_done(filename)` is called as images complete. Returns
+    the per-image render latencies in seconds.
+    """
+    items = list(items)
+    workers = max(1, min(workers or QR_WORKERS, len(items) or 1))
+    output_dir = output_dir or OUTPUT_DIR
+    latencies = []
+
+    if workers == 1:
+        chunk_results = (_render_chunk([item], output_dir) for item in items)
+        for results in chunk_results:
+            for filename, seconds in results:
+                latencies.append(seconds)
+                if on_done:
+                    on_done(filename)
+        return latencies
+
+    # A few chunks per worker keeps them busy without tiny work items
+    chunksize = max(1, min(256, -(-len(items) // (workers * 4))))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_render_chunk, chunk, output_dir)
+            for chunk in _chunks(items, chunksize)
+        ]
+        for future in futures:
+            for filename, seconds in future.result():
+                latencies.append(seconds)
+                if on_done:
+                    on_done(filename)
+    return latencies
+
+
+def print_generation_summary(latencies, elapsed):
+    """Print image count, throughput and per-image latency"""
+    if not latencies:
+        return
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"⏱ {len(latencies)} images in {elapsed:.2f}s "
+        f"({len(latencies) / elapsed:.1f} images/sec); "
+        f"per image: mean {statistics.mean(latencies) * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms"
     )
-    qr.add_data(data)
-    qr.make(fit=True)
 
-    img = qr.make_image(fill_color="black", back_color="white")
-    filepath = os.path.join(OUTPUT_DIR, filename)
-    img.save(filepath)
-    return filepath
+
+def benchmark_encoding(unique_ids):
+    """Print codes/sec fitting every code versus a pinned QRRenderer"""
+    renderer = QRRenderer()
+
+    def fit_each(data):
+        qr = renderer._new_qr()
+        qr.add_data(data)
+        qr.make(fit=True)
+
+    for label, encode in (
+        ("fit every code", fit_each),
+        ("QRRenderer", renderer.encode),
+    ):
+        start = time.perf_counter()
+        for data in unique_ids:
+            encode(data)
+        elapsed = time.perf_counter() - start
+        print(f"Encoding, {label}: {len(unique_ids) / elapsed:,.0f} codes/sec")
+    version, mask_pattern = renderer.params(unique_ids[0])
+    print(f"   pinned version {version}, mask pattern {mask_pattern}")
+
+
+def benchmark_formats(unique_ids):
+    """Print codes/sec and average file size for each format and PNG backend"""
+    variants = [("png", backend) for backend in QR_BACKENDS]
+    variants += [
+        (output_format, None) for output_format in QR_FORMATS if output_format != "png"
+    ]
+    for output_format, backend in variants:
+        settings = dict(QR_SETTINGS, format=output_format)
+        if backend:
+            settings["backend"] = backend
+        renderer = QRRenderer(settings)
+        start = time.perf_counter()
+        total = sum(len(renderer.render(data)) for data in unique_ids)
+        elapsed = time.perf_counter() - start
+        label = f"{output_format.upper()}" + (f", {backend} backend" if backend else "")
+        print(
+            f"{label}: {len(unique_ids) / elapsed:,.0f} codes/sec, "
+            f"{total / len(unique_ids):,.0f} bytes per code"
+        )
 
 
-def generate_qr_codes_from_sheet():
-    """Generate QR codes from unique_id column in Google Sheet"""
+def benchmark_generation(count=10000, workers=None):
+    """Generate `count` random codes serially and in parallel, printing both"""
+    items = [(str(uuid.uuid4()), f"qr_{i:06d}.png") for i in range(count)]
+    workers = workers or QR_WORKERS
+
+    benchmark_encoding([data for data, _ in items])
+    benchmark_formats([data for data, _ in items])
+
+    for label, worker_count in (("serial", 1), (f"{workers} workers", workers)):
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            latencies = generate_qr_codes(items, worker_count, output_dir)
+            elapsed = time.perf_counter() - start
+        print(f"\n{label}:")
+        print_generation_summary(latencies, elapsed)
+
+
+def generate_qr_codes_from_sheet(
+    workers=None, incremental=True, prune=False, table=None, output_format=None
+):
+    """Generate QR codes from unique_id column in Google Sheet
+
+    `workers` sets the number of render processes (default QR_WORKERS).
+    In incremental mode only codes that are new or whose render settings
+    changed since the last run are rendered; `prune` also deletes images
+    whose unique_id is no longer in the sheet. Pass a ParticipantSource to
+    reuse an already downloaded sheet or read a local participant file.
+    `output_format` is png, svg or pdf (default QR_FORMAT). Returns True
+    when the run completed.
+    """
+    output_format = output_format or QR_FORMAT
+    sheets_usage = sheets_metrics.snapshot()
     try:
         # Create output directory
         create_output_directory()
 
-        # Authenticate
-        client = authenticate_google_sheets()
+        if table is None:
+            table = open_configured_file_source()
+        if table is None:
+            # Authenticate
+            client = authenticate_google_sheets()
 
-        # Open spreadsheet
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        sheet = spreadsheet.worksheet(SHEET_NAME)
+            # Open spreadsheet
+            spreadsheet = client.open(SPREADSHEET_NAME)
+            table = ParticipantTable(spreadsheet.worksheet(SHEET_NAME))
 
-        # Get all values
-        all_values = sheet.get_all_values()
+        # Get headers
+        headers = table.headers
 
-        if not all_values:
+        if not headers:
             print("Sheet is empty!")
-            return
+            return False
 
-        # Get headers
-        headers = all_values[0]
         print(f"Columns: {headers}")
 
         # Find unique_id column
         if "unique_id" not in headers:
             print("Error: 'unique_id' column not found!")
-            return
+            return False
 
         unique_id_col = headers.index("unique_id")
 
-        # Generate QR codes for each row
-        print(f"\nGenerating QR codes...")
-        count = 0
+        # Collect the unique ID of each row
+        unique_ids = []
+        for _, row_data in table.iter_rows():
+            if unique_id_col < len(row_data) and row_data[unique_id_col]:
+                unique_ids.append(row_data[unique_id_col])
 
-        for row_idx in range(1, len(all_values)):  # Start from row 1 (skip header)
-            row_data = all_values[row_idx]
+        # Skip codes that were already rendered with the same settings
+        manifest = load_manifest() if incremental else {}
+        items, unchanged = plan_incremental(
+            unique_ids, manifest, output_format=output_format
+        )
+        if unchanged:
+            print(f"⊘ {unchanged} QR codes unchanged, skipping...")
+        if prune:
+            for filename in prune_orphans(
+                manifest, unique_ids, output_format=output_format
+            ):
+                print(f"🗑 Removed orphaned: {filename}")
 
-            if unique_id_col < len(row_data) and row_data[unique_id_col]:
-                unique_id = row_data[unique_id_col]
-                filename = f"qr_{unique_id[:8]}.png"  # Use first 8 chars of UUID
+        # Generate QR codes, spreading the rendering over several processes
+        ids_by_filename = {}
+        for unique_id, filename in items:
+            ids_by_filename.setdefault(filename, []).append(unique_id)
 
-                generate_qr_code(unique_id, filename)
-                print(f"✓ Generated: {filename}")
-                count += 1
+        renderer = get_renderer(output_format=output_format)
+        sizes = []
+
+        def record(filename):
+            print(f"✓ Generated: {filename}")
+            sizes.append(os.path.getsize(os.path.join(OUTPUT_DIR, filename)))
+            for unique_id in ids_by_filename[filename]:
+                version, mask_pattern = renderer.params(unique_id)
+                manifest[unique_id] = {
+                    "filename": filename,
+                    "hash": content_hash(unique_id),
+                    "settings": QR_SETTINGS,
+                    "format": output_format,
+                    "version": version,
+                    "mask_pattern": mask_pattern,
+                }
+
+        print(f"\nGenerating QR codes...")
+        start = time.perf_counter()
+        try:
+            latencies = generate_qr_codes(items, workers=workers, on_done=record)
+        finally:
+            # Keep what was rendered even if a later chunk failed
+            save_manifest(manifest)
+        elapsed = time.perf_counter() - start
 
         print(
-            f"\n✓ Successfully generated {count} QR codes in '{OUTPUT_DIR}' directory!"
+            f"\n✓ Successfully generated {len(latencies)} QR codes "
+            f"in '{OUTPUT_DIR}' directory!"
         )
+        print_generation_summary(latencies, elapsed)
+        if sizes:
+            print(
+                f"📦 {output_format.upper()}: "
+                f"{sum(sizes) / len(sizes):,.0f} bytes per code on average"
+            )
+        return True
 
     except gspread.exceptions.SpreadsheetNotFound:
         print(f"Error: Spreadsheet '{SPREADSHEET_NAME}' not found.")
@@ -100,7 +541,49 @@ def generate_qr_codes_from_sheet():
         print(f"Error: Sheet '{SHEET_NAME}' not found.")
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        sheets_metrics.print_summary(since=sheets_usage)
+    return False
 
 
 if __name__ == "__main__":
-    generate_qr_codes_from_sheet()
+    parser = argparse.ArgumentParser(description="Generate QR codes")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=QR_WORKERS,
+        help="number of render processes (default: QR_WORKERS or CPU count)",
+    )
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="N",
+        help="render N random codes serially and in parallel, then exit",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="re-render every code instead of only new or changed ones",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="delete images whose unique_id is no longer in the sheet",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(QR_FORMATS),
+        default=QR_FORMAT,
+        help="output file format (default: QR_FORMAT or png)",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_generation(args.benchmark, args.workers)
+    else:
+        generate_qr_codes_from_sheet(
+            workers=args.workers,
+            incremental=not args.full,
+            prune=args.prune,
+            output_format=args.format,
+        )
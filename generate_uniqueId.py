@@ -1,6 +1,18 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+
 import gspread
+from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
-import uuid
+
+from participant_source import open_configured_file_source
+from participant_table import ParticipantTable
+from sheets_client import instrument_client, metrics as sheets_metrics
+
+load_dotenv(".env.local")
 
 # Setup Google Sheets authentication
 SCOPES = [
@@ -10,38 +22,136 @@ SCOPES = [
 CREDENTIALS_FILE = "credentials.json"  # Download from Google Cloud Console
 SPREADSHEET_NAME = "Spave8: Qr Codes"  # Change to your spreadsheet name
 SHEET_NAME = "Sheet1"  # Change to your sheet name if different
+WRITE_CHUNK_ROWS = 10000  # IDs written per update while processing
+
+# ID format: "uuid4", "base32" (16 char short IDs) or "signed" (base32 + HMAC)
+ID_FORMAT = os.getenv("ID_FORMAT", "uuid4").strip().lower()
+ID_SIGNING_KEY = os.getenv("ID_SIGNING_KEY", "")
+SHORT_KEY_LENGTH = 8  # Leading ID characters used in QR code filenames
+
+# Random bytes needed per ID for each format
+ID_RANDOM_BYTES = {"uuid4": 16, "base32": 10, "signed": 10}
+
+# Force the UUID version 4 and RFC 4122 variant bits on a whole buffer at once
+_UUID_VERSION = bytes((b & 0x0F) | 0x40 for b in range(256))
+_UUID_VARIANT = bytes((b & 0x3F) | 0x80 for b in range(256))
 
 
 def authenticate_google_sheets():
-    """Authenticate and return Google Sheets client"""
+    """Authenticate and return a quota-aware Google Sheets client"""
     creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    return gspread.authorize(creds)
+    return instrument_client(gspread.authorize(creds))
+
+
+def short_key(unique_id):
+    """Return the part of an ID used to name its QR code file"""
+    return unique_id[:SHORT_KEY_LENGTH]
+
+
+def _uuid4_ids(buf, count):
+    buf = bytearray(buf)
+    buf[6::16] = bytes(buf[6::16]).translate(_UUID_VERSION)
+    buf[8::16] = bytes(buf[8::16]).translate(_UUID_VARIANT)
+    hex_ids = buf.hex()
+    ids = []
+    for start in range(0, count * 32, 32):
+        h = hex_ids[start : start + 32]
+        ids.append(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}")
+    return ids
+
+
+def _base32_ids(buf, count):
+    # 10 random bytes encode to exactly 16 base32 characters, no padding
+    encoded = base64.b32encode(buf).decode("ascii").lower()
+    return [encoded[start : start + 16] for start in range(0, count * 16, 16)]
+
+
+def sign_id(payload, key=None):
+    """Append an HMAC tag to an ID so forged codes can be rejected"""
+    key = (key or ID_SIGNING_KEY).encode("utf-8")
+    digest = hmac.new(key, payload.encode("ascii"), hashlib.sha256).digest()
+    return f"{payload}-{base64.b32encode(digest[:10]).decode('ascii').lower()}"
+
+
+def verify_signed_id(unique_id, key=None):
+    """Whether a signed ID carries a valid tag for the signing key"""
+    payload = unique_id.rpartition("-")[0]
+    return bool(payload) and hmac.compare_digest(sign_id(payload, key), unique_id)
+
+
+def _random_ids(count, id_format):
+    buf = os.urandom(count * ID_RANDOM_BYTES[id_format])
+    if id_format == "uuid4":
+        return _uuid4_ids(buf, count)
+    ids = _base32_ids(buf, count)
+    if id_format == "signed":
+        ids = [sign_id(payload) for payload in ids]
+    return ids
+
+
+def generate_unique_ids(count, id_format=None, taken=None):
+    """Generate `count` IDs from a single random buffer
+
+    No two IDs returned share a short key (see short_key()), and none
+    reuses a short key already in `taken`, a set that is updated with the
+    new keys. IDs that would collide are redrawn, so every ID maps to its
+    own QR code file.
+    """
+    id_format = (id_format or ID_FORMAT).lower()
+    if id_format not in ID_RANDOM_BYTES:
+        raise ValueError(
+            f"Unknown ID_FORMAT '{id_format}' "
+            f"(expected one of: {', '.join(ID_RANDOM_BYTES)})"
+        )
+    if id_format == "signed" and not ID_SIGNING_KEY:
+        raise ValueError("ID_FORMAT=signed requires ID_SIGNING_KEY to be set")
+
+    taken = set() if taken is None else taken
+    ids = []
+    while len(ids) < count:
+        for unique_id in _random_ids(count - len(ids), id_format):
+            key = short_key(unique_id)
+            if key not in taken:
+                taken.add(key)
+                ids.append(unique_id)
+    return ids
 
 
 def create_unique_id():
     """Generate a unique ID"""
-    return str(uuid.uuid4())
+    return generate_unique_ids(1)[0]
+
 
+def add_unique_ids_to_sheet(table=None, overwrite=False):
+    """Add unique ID column to existing Google Sheet
 
-def add_unique_ids_to_sheet():
-    """Add unique ID column to existing Google Sheet"""
+    Only rows without an ID get a new one, so re-running on a filled
+    column writes nothing; pass overwrite=True to replace every ID (this
+    invalidates QR codes and emails already sent). Pass a
+    ParticipantSource (such as a ParticipantTable) to reuse an already
+    downloaded sheet or a local participant file; the new IDs are applied
+    to it so later stages see them without a re-read. Returns True once
+    every row has an ID.
+    """
+    sheets_usage = sheets_metrics.snapshot()
     try:
-        # Authenticate
-        client = authenticate_google_sheets()
+        if table is None:
+            table = open_configured_file_source()
+        if table is None:
+            # Authenticate
+            client = authenticate_google_sheets()
 
-        # Open spreadsheet
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        sheet = spreadsheet.worksheet(SHEET_NAME)
+            # Open spreadsheet
+            spreadsheet = client.open(SPREADSHEET_NAME)
+            table = ParticipantTable(spreadsheet.worksheet(SHEET_NAME))
 
-        # Get all values
-        all_values = sheet.get_all_values()
+        # Get headers
+        headers = table.headers
 
-        if not all_values:
+        if not headers:
             print("Sheet is empty!")
-            return
+            return False
 
-        # Get headers
-        headers = all_values[0]
         print(f"Current columns: {headers}")
 
         # Check if unique_id column already exists
@@ -50,32 +160,55 @@ def add_unique_ids_to_sheet():
             print(f"'unique_id' column already exists at column {col_index}")
         else:
             # Add header for unique_id
-            col_index = len(headers) + 1
-            sheet.update_cell(1, col_index, "unique_id")
+            col_index = table.ensure_column("unique_id")
             print(f"Added 'unique_id' header at column {col_index}")
 
-        # Add unique IDs for each row using batch update
-        num_rows = len(all_values)
-        print(f"Processing {num_rows - 1} rows...")
-
-        # Prepare batch update data
-        updates = []
-        unique_ids = []
-
-        for row_idx in range(2, num_rows + 1):  # Start from row 2 (skip header)
-            unique_id = create_unique_id()
-            unique_ids.append(unique_id)
-            updates.append([unique_id])
-
-        # Batch update all rows at once
-        start_cell = f"{chr(64 + col_index)}{2}"  # Convert column number to letter
-        cell_range = f"{start_cell}:{chr(64 + col_index)}{num_rows}"
-        sheet.batch_update([{"range": cell_range, "values": updates}])
-
-        for idx, uid in enumerate(unique_ids, start=2):
-            print(f"✓ Row {idx}: {uid}")
-
-        print(f"\n✓ Successfully added unique IDs to {num_rows - 1} rows!")
+        # Find the rows that still need an ID
+        print("Scanning rows...")
+        taken = set()
+        missing = []
+        existing = 0
+        clashes = 0
+
+        for row_idx, row_data in table.iter_rows():
+            unique_id = row_data[col_index - 1] if col_index <= len(row_data) else ""
+            if unique_id.strip() and not overwrite:
+                key = short_key(unique_id.strip())
+                if key in taken:
+                    clashes += 1
+                    print(f"⚠️  Row {row_idx}: ID shares its QR filename key '{key}'")
+                taken.add(key)
+                existing += 1
+            else:
+                missing.append(row_idx)
+
+        print(f"{existing} rows already have IDs, {len(missing)} need one")
+        if clashes:
+            print(
+                f"⚠️  {clashes} existing IDs share a QR filename with another row; "
+                f"run with --overwrite to replace every ID"
+            )
+
+        if not missing:
+            print("\n✓ Every row already has a unique ID, nothing to write.")
+            return True
+
+        # Add unique IDs to those rows, writing them in large batches; runs
+        # of consecutive rows are merged into one range by the source
+        print(f"Processing rows ({ID_FORMAT} IDs)...")
+        for start in range(0, len(missing), WRITE_CHUNK_ROWS):
+            rows = missing[start : start + WRITE_CHUNK_ROWS]
+            ids = generate_unique_ids(len(rows), taken=taken)
+            updates = {}
+            for row_idx, unique_id in zip(rows, ids):
+                updates[(row_idx, col_index)] = unique_id
+                print(f"✓ Row {row_idx}: {unique_id}")
+            table.write_cells(updates)
+
+        table.commit()
+
+        print(f"\n✓ Successfully added unique IDs to {len(missing)} rows!")
+        return True
 
     except gspread.exceptions.SpreadsheetNotFound:
         print(f"Error: Spreadsheet '{SPREADSHEET_NAME}' not found.")
@@ -84,7 +217,18 @@ def add_unique_ids_to_sheet():
         print(f"Error: Sheet '{SHEET_NAME}' not found in the spreadsheet.")
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        sheets_metrics.print_summary(since=sheets_usage)
+    return False
 
 
 if __name__ == "__main__":
-    add_unique_ids_to_sheet()
+    parser = argparse.ArgumentParser(description="Add unique IDs to the sheet")
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="replace every existing ID instead of only filling empty cells",
+    )
+    args = parser.parse_args()
+
+    add_unique_ids_to_sheet(overwrite=args.overwrite)
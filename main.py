@@ -2,6 +2,15 @@
 """
 QR Code Generator - Terminal Interface
 A user-friendly terminal interface for managing QR code generation workflow.
+
+Run without arguments for the interactive menu, or with a subcommand
+(ids, qr, send, all, verify, status) for unattended runs, e.g. from cron:
+
+    python main.py all --send-workers 4
+    python main.py status
+
+The workflow modules (gspread, google-auth, qrcode, SMTP) are imported only
+by the commands that need them, so `status` starts almost instantly.
 """
 
 import os
@@ -9,15 +18,8 @@ import sys
 import time
 from pathlib import Path
 
-# Import our modules
-try:
-    from generate_QR import generate_qr_codes_from_sheet
-    from generate_uniqueId import add_unique_ids_to_sheet
-    from send_email_with_QR import send_emails_with_qr_codes
-except ImportError as e:
-    print(f"❌ Error importing modules: {e}")
-    print("Please ensure all script files are in the same directory.")
-    sys.exit(1)
+# QR code files in any of the formats generate_QR.py writes
+QR_FILE_EXTENSIONS = (".png", ".svg", ".pdf")
 
 
 class QRCodeManager:
@@ -95,7 +97,9 @@ class QRCodeManager:
         # Check qr_codes directory for email step
         if step >= 3 and not os.path.exists("qr_codes"):
             issues.append("❌ qr_codes directory not found")
-        elif step >= 3 and not any(f.endswith(".png") for f in os.listdir("qr_codes")):
+        elif step >= 3 and not any(
+            f.endswith(QR_FILE_EXTENSIONS) for f in os.listdir("qr_codes")
+        ):
             issues.append("⚠️  No QR code images found in qr_codes directory")
 
         return issues
@@ -129,10 +133,15 @@ class QRCodeManager:
             return
 
         try:
+            from generate_uniqueId import add_unique_ids_to_sheet
+
             print("\n" + "=" * 40)
-            add_unique_ids_to_sheet()
+            succeeded = add_unique_ids_to_sheet()
             print("=" * 40)
-            print("\n✅ Unique ID generation completed successfully!")
+            if succeeded:
+                print("\n✅ Unique ID generation completed successfully!")
+            else:
+                print("\n❌ Unique ID generation did not complete")
 
         except Exception as e:
             print(f"\n❌ Error during unique ID generation: {str(e)}")
@@ -167,10 +176,15 @@ class QRCodeManager:
             return
 
         try:
+            from generate_QR import generate_qr_codes_from_sheet
+
             print("\n" + "=" * 40)
-            generate_qr_codes_from_sheet()
+            succeeded = generate_qr_codes_from_sheet()
             print("=" * 40)
-            print("\n✅ QR code generation completed successfully!")
+            if succeeded:
+                print("\n✅ QR code generation completed successfully!")
+            else:
+                print("\n❌ QR code generation did not complete")
 
         except Exception as e:
             print(f"\n❌ Error during QR code generation: {str(e)}")
@@ -214,10 +228,15 @@ class QRCodeManager:
             return
 
         try:
+            from send_email_with_QR import send_emails_with_qr_codes
+
             print("\n" + "=" * 40)
-            send_emails_with_qr_codes()
+            succeeded = send_emails_with_qr_codes()
             print("=" * 40)
-            print("\n✅ Email sending completed successfully!")
+            if succeeded:
+                print("\n✅ Email sending completed successfully!")
+            else:
+                print("\n❌ Email sending did not complete")
 
         except Exception as e:
             print(f"\n❌ Error during email sending: {str(e)}")
@@ -226,10 +245,10 @@ class QRCodeManager:
         self.wait_for_enter()
 
     def run_complete_workflow(self):
-        """Run the complete workflow in sequence"""
+        """Run the complete workflow as a concurrent pipeline"""
         self.print_step_header("ALL", "Complete Workflow")
 
-        print("🔄 This will run all steps in sequence:")
+        print("🔄 This will run all steps together as a pipeline:")
         print("   1️⃣  Generate Unique IDs")
         print("   2️⃣  Generate QR Codes")
         print("   3️⃣  Send Emails with QR Codes")
@@ -241,47 +260,46 @@ class QRCodeManager:
             self.wait_for_enter()
             return
 
-        # Step 1: Generate Unique IDs
+        # Authenticate and download the sheet (or open the local
+        # participant file) once for all three steps
         try:
-            print("\n" + "🔵" * 20)
-            print("STEP 1/3: Generating Unique IDs...")
-            print("🔵" * 20)
-            add_unique_ids_to_sheet()
-            print("✅ Step 1 completed!")
-            time.sleep(2)
+            from participant_source import open_participant_source
 
+            table = open_participant_source()
         except Exception as e:
-            print(f"❌ Step 1 failed: {str(e)}")
+            print(f"❌ Could not open the participant list: {str(e)}")
             self.wait_for_enter()
             return
 
-        # Step 2: Generate QR Codes
+        # All three steps run at once: rows get IDs, codes are rendered in
+        # memory and emails go out as soon as each row is ready
         try:
-            print("\n" + "🟡" * 20)
-            print("STEP 2/3: Generating QR Codes...")
-            print("🟡" * 20)
-            generate_qr_codes_from_sheet()
-            print("✅ Step 2 completed!")
-            time.sleep(2)
-
-        except Exception as e:
-            print(f"❌ Step 2 failed: {str(e)}")
-            self.wait_for_enter()
-            return
+            from sheets_client import metrics as sheets_metrics
+            from workflow_engine import STREAM_PERSIST_QR, run_workflow_pipeline
 
-        # Step 3: Send Emails
-        try:
             print("\n" + "🟢" * 20)
-            print("STEP 3/3: Sending Emails...")
+            print("Running IDs → QR codes → emails as a pipeline (Ctrl-C stops)...")
             print("🟢" * 20)
-            send_emails_with_qr_codes()
-            print("✅ Step 3 completed!")
+            pipeline = run_workflow_pipeline(table, persist_qr=STREAM_PERSIST_QR)
 
         except Exception as e:
-            print(f"❌ Step 3 failed: {str(e)}")
+            print(f"❌ Workflow failed: {str(e)}")
+            self.wait_for_enter()
+            return
+
+        if not pipeline.succeeded:
+            if pipeline.failures:
+                print(
+                    f"\n⚠️  Workflow finished with {len(pipeline.failures)} failed email(s)"
+                )
+            elif pipeline.stop_reason != "interrupted":
+                print("\n❌ Workflow did not complete")
             self.wait_for_enter()
             return
 
+        if hasattr(table, "reads"):
+            print(f"\n📡 Sheet downloads for the whole workflow: {table.reads}")
+        sheets_metrics.print_summary("Sheets API usage for the whole workflow")
         print("\n" + "🎉" * 30)
         print("🎉 COMPLETE WORKFLOW FINISHED SUCCESSFULLY! 🎉")
         print("🎉" * 30)
@@ -329,7 +347,9 @@ class QRCodeManager:
         # Check directories
         print("📂 Directories:")
         if os.path.exists("qr_codes"):
-            qr_count = len([f for f in os.listdir("qr_codes") if f.endswith(".png")])
+            qr_count = len(
+                [f for f in os.listdir("qr_codes") if f.endswith(QR_FILE_EXTENSIONS)]
+            )
             print(f"   ✅ qr_codes/ - {qr_count} QR code images")
         else:
             print("   ⚠️  qr_codes/ - Directory will be created when needed")
@@ -360,13 +380,20 @@ class QRCodeManager:
 
     def view_status(self):
         """View project status and statistics"""
+        self.print_status()
+        self.wait_for_enter()
+
+    def print_status(self):
+        """Print project status and statistics"""
         self.print_step_header("STATUS", "Project Status")
 
         print("📊 Project Statistics:\n")
 
         # QR Codes count
         if os.path.exists("qr_codes"):
-            qr_files = [f for f in os.listdir("qr_codes") if f.endswith(".png")]
+            qr_files = [
+                f for f in os.listdir("qr_codes") if f.endswith(QR_FILE_EXTENSIONS)
+            ]
             print(f"📱 QR Codes Generated: {len(qr_files)}")
         else:
             print("📱 QR Codes Generated: 0 (directory not found)")
@@ -405,11 +432,21 @@ class QRCodeManager:
                 time_str = time.strftime("%Y-%m-%d %H:%M", time.localtime(mod_time))
                 print(f"   🔸 {file} - {time_str}")
 
+        # Google Sheets API usage since the program started; the client
+        # module is only loaded once a command has talked to Google
+        print("\n📡 Google Sheets API (this session):")
+        sheets_client = sys.modules.get("sheets_client")
+        if sheets_client and (
+            sheets_client.metrics.calls or sheets_client.metrics.errors
+        ):
+            for line in sheets_client.metrics.summary_lines():
+                print(f"   {line}")
+        else:
+            print("   No requests made yet")
+
         print("\n" + "=" * 50)
         print("💡 Tip: Use 'Check Configuration' to verify system setup")
 
-        self.wait_for_enter()
-
     def exit_program(self):
         """Exit the application"""
         print("\n👋 Thank you for using QR Code Generator!")
@@ -437,8 +474,145 @@ class QRCodeManager:
                 self.wait_for_enter()
 
 
+def build_parser():
+    """Command line interface for unattended runs"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="QR code generator. Run without a command for the menu."
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    ids = commands.add_parser("ids", help="add unique IDs to rows without one")
+    ids.add_argument(
+        "--overwrite", action="store_true", help="replace every existing ID"
+    )
+
+    qr = commands.add_parser("qr", help="render QR codes into qr_codes/")
+    qr.add_argument("--workers", type=int, help="render processes")
+    qr.add_argument(
+        "--full", action="store_true", help="re-render every code (no manifest)"
+    )
+    qr.add_argument(
+        "--prune", action="store_true", help="delete codes no longer in the sheet"
+    )
+    qr.add_argument(
+        "--format",
+        choices=["pdf", "png", "svg"],
+        help="file format (default: QR_FORMAT or png)",
+    )
+
+    send = commands.add_parser("send", help="email every row not yet sent")
+    send.add_argument("--workers", type=int, help="emails sent concurrently")
+    send.add_argument("--stream", action="store_true", help="render QR codes in memory")
+    send.add_argument(
+        "--persist", action="store_true", help="with --stream, also save them"
+    )
+    send.add_argument(
+        "--format",
+        choices=["pdf", "png", "svg"],
+        help="QR code format to attach (default: whichever was generated)",
+    )
+
+    workflow = commands.add_parser(
+        "all", help="assign IDs, render codes and send emails as a pipeline"
+    )
+    workflow.add_argument("--send-workers", type=int, help="emails sent at once")
+    workflow.add_argument("--qr-workers", type=int, help="render processes")
+    workflow.add_argument(
+        "--persist-qr",
+        action="store_true",
+        default=None,
+        help="also save the rendered QR codes (default: STREAM_PERSIST_QR)",
+    )
+    workflow.add_argument(
+        "--format",
+        choices=["pdf", "png", "svg"],
+        help="QR code format to attach (default: QR_FORMAT or png)",
+    )
+
+    verify = commands.add_parser(
+        "verify", help="decode qr_codes/ and check them against the sheet"
+    )
+    verify.add_argument("--workers", type=int, help="decode processes")
+    verify.add_argument(
+        "--format",
+        choices=["pdf", "png", "svg"],
+        help="file format (default: QR_FORMAT or png)",
+    )
+
+    commands.add_parser("status", help="show project status")
+    return parser
+
+
+def run_command(args):
+    """Run one CLI command without prompts; returns the exit status"""
+    if args.command == "status":
+        QRCodeManager().print_status()
+        return 0
+
+    if args.command == "ids":
+        from generate_uniqueId import add_unique_ids_to_sheet
+
+        ok = add_unique_ids_to_sheet(overwrite=args.overwrite)
+
+    elif args.command == "qr":
+        from generate_QR import generate_qr_codes_from_sheet
+
+        ok = generate_qr_codes_from_sheet(
+            workers=args.workers,
+            incremental=not args.full,
+            prune=args.prune,
+            output_format=args.format,
+        )
+
+    elif args.command == "verify":
+        from verify_QR import verify_qr_codes_from_sheet
+
+        ok = verify_qr_codes_from_sheet(workers=args.workers, output_format=args.format)
+
+    elif args.command == "send":
+        from send_email_with_QR import send_emails_with_qr_codes
+
+        ok = send_emails_with_qr_codes(
+            workers=args.workers,
+            stream=args.stream,
+            persist=args.persist,
+            output_format=args.format,
+        )
+
+    else:
+        from participant_source import open_participant_source
+        from workflow_engine import STREAM_PERSIST_QR, run_workflow_pipeline
+
+        persist = STREAM_PERSIST_QR if args.persist_qr is None else args.persist_qr
+        pipeline = run_workflow_pipeline(
+            open_participant_source(),
+            send_workers=args.send_workers,
+            qr_workers=args.qr_workers,
+            persist_qr=persist,
+            output_format=args.format,
+        )
+        if pipeline.stop_reason == "interrupted":
+            return 130
+        ok = pipeline.succeeded
+
+    return 0 if ok else 1
+
+
 def main():
     """Entry point of the application"""
+    if len(sys.argv) > 1:
+        args = build_parser().parse_args()
+        try:
+            sys.exit(run_command(args))
+        except KeyboardInterrupt:
+            print("\n⏹ Interrupted")
+            sys.exit(130)
+        except Exception as e:
+            print(f"\n❌ Fatal error: {str(e)}")
+            sys.exit(1)
+
     try:
         manager = QRCodeManager()
         manager.run()
@@ -0,0 +1,124 @@
+import base64
+import mimetypes
+import secrets
+from email.header import Header
+
+CRLF = b"\r\n"
+
+
+def _b64(data):
+    """Base64 with 76-character CRLF-terminated lines, as MIME requires"""
+    return base64.encodebytes(data).replace(b"\n", CRLF)
+
+
+def qr_mime_type(filename):
+    """MIME type of a QR code file from its extension (PNG if unknown)"""
+    return mimetypes.guess_type(filename)[0] or "image/png"
+
+
+def _header_value(value, name):
+    """Encode a header value as RFC 2047 only when it is not plain ASCII
+
+    Long values are folded with CRLF, as SMTP requires (Header defaults to
+    a bare LF), leaving room for the "Name: " prefix on the first line.
+    """
+    try:
+        value.encode("ascii")
+        return value
+    except UnicodeEncodeError:
+        return Header(value, "utf-8", header_name=name).encode(linesep="\r\n")
+
+
+class MessageFactory:
+    """Serialize QR code emails straight to bytes from a prebuilt skeleton
+
+    The From/Subject headers, the multipart structure and every static
+    attachment are serialized once. Building a message then only encodes
+    the To header, the rendered HTML body and the inline QR image and
+    joins them with the prepared bytes, ready for smtplib's sendmail().
+    The layout matches build_email_message(): multipart/related holding a
+    multipart/alternative HTML body, the inline QR image (Content-ID
+    <qr_code>) and the attachments.
+    """
+
+    def __init__(self, sender, subject, attachment_cache, attachment_paths=()):
+        # "=_" never occurs in base64 data, so the boundaries cannot clash
+        token = secrets.token_hex(12)
+        related = f"=_related_{token}".encode("ascii")
+        alternative = f"=_alternative_{token}".encode("ascii")
+        self.missing_attachments = []
+
+        self._head = CRLF.join(
+            [
+                b"From: " + _header_value(sender, "From").encode("ascii"),
+                b"Subject: " + _header_value(subject, "Subject").encode("ascii"),
+                b"MIME-Version: 1.0",
+                b'Content-Type: multipart/related; boundary="' + related + b'"',
+                b"",
+                b"--" + related,
+                b'Content-Type: multipart/alternative; boundary="' + alternative + b'"',
+                b"",
+                b"--" + alternative,
+                b'Content-Type: text/html; charset="utf-8"',
+                b"Content-Transfer-Encoding: base64",
+                b"",
+                b"",
+            ]
+        )
+        # Encoded bodies already end with CRLF, so boundaries follow directly
+        self._after_body = b"--" + alternative + b"--" + CRLF
+        self._part_start = b"--" + related + CRLF
+
+        tail = []
+        for path in attachment_paths:
+            entry = attachment_cache.get(path)
+            if entry is None:
+                self.missing_attachments.append(path)
+                continue
+            tail.append(
+                self._part_start
+                + CRLF.join(
+                    [
+                        f"Content-Type: {entry.maintype}/{entry.subtype}".encode(),
+                        b"MIME-Version: 1.0",
+                        b"Content-Transfer-Encoding: base64",
+                        f"Content-Disposition: attachment; filename= "
+                        f"{entry.filename}".encode(),
+                        b"",
+                        entry.encoded.encode("ascii").replace(b"\n", CRLF),
+                    ]
+                )
+            )
+        tail.append(b"--" + related + b"--" + CRLF)
+        self._tail = b"".join(tail)
+
+    def build(self, recipient_email, html_body, qr_image_data, qr_filename):
+        """Return the complete message for one recipient as bytes"""
+        parts = [
+            b"To: " + _header_value(recipient_email, "To").encode("ascii") + CRLF,
+            self._head,
+            _b64(html_body.encode("utf-8")),
+            self._after_body,
+        ]
+        if qr_image_data is not None:
+            filename = qr_filename.encode("utf-8")
+            parts.append(self._part_start)
+            parts.append(
+                CRLF.join(
+                    [
+                        b"Content-Type: "
+                        + qr_mime_type(qr_filename).encode("ascii")
+                        + b'; name="'
+                        + filename
+                        + b'"',
+                        b"MIME-Version: 1.0",
+                        b"Content-Transfer-Encoding: base64",
+                        b"Content-ID: <qr_code>",
+                        b'Content-Disposition: inline; filename="' + filename + b'"',
+                        b"",
+                        _b64(qr_image_data),
+                    ]
+                )
+            )
+        parts.append(self._tail)
+        return b"".join(parts)
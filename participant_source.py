@@ -0,0 +1,333 @@
+import csv
+import json
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env.local
+load_dotenv(".env.local")
+
+# Read participants from this CSV/JSONL/Parquet file instead of Google Sheets
+PARTICIPANT_SOURCE = os.getenv("PARTICIPANT_SOURCE", "").strip()
+
+
+class ParticipantSource:
+    """Where participant rows are read from and status columns written to
+
+    Rows are numbered like sheet rows: the header is row 1 and the first
+    participant is row 2. Columns are 1-based. Writes may be buffered
+    until commit().
+    """
+
+    @property
+    def headers(self):
+        raise NotImplementedError
+
+    def iter_rows(self):
+        """Yield (row_number, values) for every participant row"""
+        raise NotImplementedError
+
+    def ensure_column(self, name):
+        """Return the 1-based column for a header, adding it if missing"""
+        raise NotImplementedError
+
+    def write_cells(self, cells):
+        """Write {(row, col): value} updates"""
+        raise NotImplementedError
+
+    def commit(self):
+        """Persist any buffered writes"""
+
+    def values(self):
+        """All rows, header first, like gspread's get_all_values()"""
+        return [list(self.headers)] + [row for _, row in self.iter_rows()]
+
+
+class LocalFileSource(ParticipantSource):
+    """Participant rows in a local file, streamed one row at a time
+
+    Updates are buffered in memory and applied by commit(), which streams
+    the file into a temporary copy with the changes and atomically
+    replaces the original. Once `max_pending` cells are buffered they are
+    committed automatically, so memory stays bounded on huge files.
+    """
+
+    def __init__(self, path, max_pending=100000):
+        self.path = path
+        self.max_pending = max_pending
+        self.commits = 0
+        self._headers = None
+        self._added_headers = []
+        self._pending = {}  # row -> {col: value}
+        self._pending_count = 0
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            self._headers = self._read_headers()
+        return self._headers + self._added_headers
+
+    def iter_rows(self):
+        width = len(self.headers)
+        for row_number, row in enumerate(self._read_rows(), start=2):
+            row = row + [""] * (width - len(row))
+            for col, value in self._pending.get(row_number, {}).items():
+                row[col - 1] = value
+            yield row_number, row
+
+    def ensure_column(self, name):
+        headers = self.headers
+        if name in headers:
+            return headers.index(name) + 1
+        self._added_headers.append(name)
+        return len(headers) + 1
+
+    def write_cells(self, cells):
+        for (row, col), value in cells.items():
+            row_updates = self._pending.setdefault(row, {})
+            if col not in row_updates:
+                self._pending_count += 1
+            row_updates[col] = value
+        if self._pending_count >= self.max_pending:
+            self.commit()
+
+    def commit(self):
+        if not self._pending and not self._added_headers:
+            return
+
+        headers = self.headers
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            os.chmod(tmp_path, os.stat(self.path).st_mode)
+            self._write_updates(tmp_path, headers, self._pending)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._headers = headers
+        self._added_headers = []
+        self._pending = {}
+        self._pending_count = 0
+        self.commits += 1
+
+    def _updated_rows(self, headers, updates):
+        width = len(headers)
+        for row_number, row in enumerate(self._read_rows(), start=2):
+            row = row + [""] * (width - len(row))
+            for col, value in updates.get(row_number, {}).items():
+                row[col - 1] = value
+            yield row
+
+    # Format specific parts
+
+    def _read_headers(self):
+        raise NotImplementedError
+
+    def _read_rows(self):
+        """Yield the data rows as lists of strings, header excluded"""
+        raise NotImplementedError
+
+    def _write_updates(self, path, headers, updates):
+        """Write the file with `updates` applied to `path`"""
+        self._write_rows(path, headers, self._updated_rows(headers, updates))
+
+    def _write_rows(self, path, headers, rows):
+        raise NotImplementedError
+
+
+class CSVSource(LocalFileSource):
+    """Participants in a CSV file whose first row holds the headers"""
+
+    def _read_headers(self):
+        with open(self.path, "r", newline="", encoding="utf-8-sig") as f:
+            return next(csv.reader(f), [])
+
+    def _read_rows(self):
+        with open(self.path, "r", newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            yield from reader
+
+    def _write_rows(self, path, headers, rows):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class JSONLSource(LocalFileSource):
+    """Participants as one JSON object per line
+
+    The headers are every key used by any line, in order of first use.
+    Values are shown as text (JSON for numbers, booleans and nested
+    values), but commit() only rewrites the lines it updates and only the
+    updated keys in them, so every other value keeps its JSON type.
+    """
+
+    def _read_headers(self):
+        headers = {}
+        for _, record in self._read_records():
+            headers.update(dict.fromkeys(record))
+        return list(headers)
+
+    def _read_records(self):
+        """Yield (line, record) for every non-blank line"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield line, json.loads(line)
+
+    def _read_rows(self):
+        headers = self.headers
+        for _, record in self._read_records():
+            yield [_json_cell(record.get(header)) for header in headers]
+
+    def _write_updates(self, path, headers, updates):
+        with open(path, "w", encoding="utf-8") as f:
+            for row_number, (line, record) in enumerate(self._read_records(), 2):
+                row_updates = updates.get(row_number)
+                if row_updates:
+                    for col, value in row_updates.items():
+                        record[headers[col - 1]] = value
+                    line = json.dumps(record, ensure_ascii=False) + "\n"
+                elif not line.endswith("\n"):
+                    line += "\n"
+                f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetSource(LocalFileSource):
+    """Participants in a Parquet file, read in record batches (needs pyarrow)
+
+    commit() keeps the file's schema: updated values are converted to the
+    type of their column, and added columns are strings that are null on
+    rows without a value.
+    """
+
+    batch_size = 10000
+
+    def __init__(self, path, max_pending=100000):
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "Reading Parquet files requires pyarrow: pip install pyarrow"
+            )
+        super().__init__(path, max_pending)
+
+    def _read_headers(self):
+        import pyarrow.parquet as pq
+
+        return list(pq.ParquetFile(self.path).schema_arrow.names)
+
+    def _read_rows(self):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(self.path).iter_batches(self.batch_size):
+            columns = [column.to_pylist() for column in batch.columns]
+            for row in zip(*columns):
+                yield [_cell(value) for value in row]
+
+    def _write_updates(self, path, headers, updates):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        source = pq.ParquetFile(self.path)
+        schema = source.schema_arrow
+        for header in headers[len(schema) :]:
+            schema = schema.append(pa.field(header, pa.string()))
+
+        first_row = 2
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in source.iter_batches(self.batch_size):
+                rows = range(first_row, first_row + batch.num_rows)
+                first_row += batch.num_rows
+                columns = list(batch.columns)
+                columns += [
+                    pa.nulls(batch.num_rows, pa.string())
+                    for _ in range(len(columns), len(schema))
+                ]
+                changed = {}
+                for offset, row_number in enumerate(rows):
+                    for col, value in updates.get(row_number, {}).items():
+                        changed.setdefault(col - 1, {})[offset] = value
+                for index, values in changed.items():
+                    columns[index] = _updated_column(
+                        columns[index], schema.field(index), values
+                    )
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+def _json_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _updated_column(column, field, values):
+    """Return `column` with {offset: text} values converted to its type"""
+    import pyarrow as pa
+
+    merged = column.to_pylist()
+    for offset, value in values.items():
+        try:
+            merged[offset] = pa.array([value]).cast(field.type)[0].as_py()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            raise ValueError(
+                f"Cannot store {value!r} in Parquet column '{field.name}' "
+                f"of type {field.type}"
+            )
+    return pa.array(merged, field.type)
+
+
+FILE_SOURCES = {
+    ".csv": CSVSource,
+    ".jsonl": JSONLSource,
+    ".parquet": ParquetSource,
+}
+
+
+def open_file_source(path):
+    """Open a local participant file, picking the format from its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FILE_SOURCES:
+        raise ValueError(
+            f"Unsupported participant file '{path}' "
+            f"(expected one of: {', '.join(FILE_SOURCES)})"
+        )
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Participant file not found: {path}")
+    return FILE_SOURCES[extension](path)
+
+
+def open_configured_file_source():
+    """Open the PARTICIPANT_SOURCE file, or return None to use Google Sheets"""
+    if PARTICIPANT_SOURCE and PARTICIPANT_SOURCE.lower() != "sheets":
+        return open_file_source(PARTICIPANT_SOURCE)
+    return None
+
+
+def open_participant_source():
+    """Open PARTICIPANT_SOURCE if set, otherwise the configured Google Sheet"""
+    source = open_configured_file_source()
+    if source is not None:
+        return source
+
+    from participant_table import open_participant_table
+
+    return open_participant_table()
@@ -0,0 +1,122 @@
+import itertools
+import os
+import time
+
+import gspread
+from dotenv import load_dotenv
+from google.oauth2.service_account import Credentials
+
+from participant_source import ParticipantSource
+from sheet_writer import coalesce_cells, write_ranges
+from sheets_client import instrument_client
+
+# Load environment variables from .env.local
+load_dotenv(".env.local")
+
+# Setup Google Sheets authentication
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+CREDENTIALS_FILE = "credentials.json"
+SPREADSHEET_NAME = os.getenv("SPREADSHEET_NAME", "Your Spreadsheet Name")
+SHEET_NAME = os.getenv("SHEET_NAME", "Sheet1")
+# batch_update requests sent at once when a write needs several
+SHEET_WRITE_WORKERS = int(os.getenv("SHEET_WRITE_WORKERS") or 2)
+
+
+def authenticate_google_sheets():
+    """Authenticate and return a quota-aware Google Sheets client"""
+    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
+    return instrument_client(gspread.authorize(creds))
+
+
+class ParticipantTable(ParticipantSource):
+    """In-memory copy of the participant worksheet shared between stages
+
+    The sheet is downloaded once and reused; stages that write to the sheet
+    also apply their changes here so the next stage sees them without a
+    re-read. With `max_age` set, values older than that many seconds are
+    fetched again on next access; call refresh() to force a re-read.
+    """
+
+    def __init__(self, sheet, max_age=None):
+        self.sheet = sheet
+        self.max_age = max_age
+        self.reads = 0
+        self._values = None
+        self._fetched_at = 0.0
+
+    @property
+    def is_stale(self):
+        if self._values is None:
+            return True
+        if self.max_age is None:
+            return False
+        return time.monotonic() - self._fetched_at > self.max_age
+
+    def refresh(self):
+        """Download every value in the sheet again"""
+        self._values = self.sheet.get_all_values()
+        self._fetched_at = time.monotonic()
+        self.reads += 1
+        return self._values
+
+    def values(self):
+        """All rows, header first, as returned by get_all_values()"""
+        if self.is_stale:
+            self.refresh()
+        return self._values
+
+    @property
+    def headers(self):
+        values = self.values()
+        return values[0] if values else []
+
+    def iter_rows(self):
+        rows = itertools.islice(self.values(), 1, None)
+        for row_idx, row_data in enumerate(rows, start=2):
+            yield row_idx, row_data
+
+    def write_cells(self, cells):
+        """Write {(row, col): value} to the sheet with batched updates
+
+        Returns the number of batch_update calls, normally one; large
+        writes are split into size-bounded requests sent in parallel.
+        """
+        if not cells:
+            return 0
+        calls = write_ranges(
+            self.sheet, coalesce_cells(cells), workers=SHEET_WRITE_WORKERS
+        )
+        for (row, col), value in cells.items():
+            self.set_cell(row, col, value)
+        return calls
+
+    def ensure_column(self, name):
+        """Return the 1-based column for a header, adding it if missing"""
+        headers = self.headers
+        if name in headers:
+            return headers.index(name) + 1
+
+        col = len(headers) + 1
+        self.sheet.update_cell(1, col, name)
+        self.set_cell(1, col, name)
+        return col
+
+    def set_cell(self, row, col, value):
+        """Record a value already written to the sheet (1-based row/col)"""
+        values = self.values()
+        while len(values) < row:
+            values.append([])
+        row_data = values[row - 1]
+        if len(row_data) < col:
+            row_data.extend([""] * (col - len(row_data)))
+        row_data[col - 1] = value
+
+
+def open_participant_table(client=None, max_age=None):
+    """Authenticate once and open the configured worksheet as a table"""
+    client = instrument_client(client or authenticate_google_sheets())
+    spreadsheet = client.open(SPREADSHEET_NAME)
+    return ParticipantTable(spreadsheet.worksheet(SHEET_NAME), max_age=max_age)
@@ -0,0 +1,69 @@
+import struct
+import zlib
+
+try:
+    import numpy
+except ImportError:  # Rows are expanded in pure Python instead
+    numpy = None
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Level 9 is ~3x slower than 6 on QR scanlines and no smaller
+COMPRESSION_LEVEL = 6
+
+
+def _chunk(kind, data):
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
+
+
+def _scanlines_numpy(matrix, box_size):
+    modules = numpy.asarray(matrix, dtype=numpy.uint8)
+    # One packed row per module row, each pixel row starting with filter 0
+    rows = numpy.packbits(numpy.repeat(modules, box_size, axis=1), axis=1)
+    rows = numpy.hstack([numpy.zeros((len(rows), 1), numpy.uint8), rows])
+    return numpy.repeat(rows, box_size, axis=0).tobytes()
+
+
+def _scanlines_python(matrix, box_size):
+    width = len(matrix[0]) * box_size
+    padding = "0" * (-width % 8)
+    size = (width + 7) // 8
+    scanlines = []
+    for row in matrix:
+        bits = "".join("1" if dark else "0" for dark in row for _ in range(box_size))
+        line = b"\0" + int(bits + padding, 2).to_bytes(size, "big")
+        scanlines.append(line * box_size)
+    return b"".join(scanlines)
+
+
+def encode_png(matrix, box_size, fill_rgb, back_rgb):
+    """Encode a QR module matrix as a 1-bit palette PNG
+
+    `matrix` is a list of rows of booleans (True = dark module) including
+    the border, as returned by qrcode's get_matrix(). Each module becomes a
+    `box_size` square of pixels. There is no timestamp or other metadata,
+    so the same matrix always gives the same bytes.
+    """
+    height = len(matrix) * box_size
+    width = len(matrix[0]) * box_size if matrix else 0
+    if numpy is not None:
+        scanlines = _scanlines_numpy(matrix, box_size)
+    else:
+        scanlines = _scanlines_python(matrix, box_size)
+
+    # Bit depth 1, colour type 3 (palette): index 0 = background
+    header = struct.pack(">IIBBBBB", width, height, 1, 3, 0, 0, 0)
+    palette = bytes(back_rgb) + bytes(fill_rgb)
+    return b"".join(
+        (
+            PNG_SIGNATURE,
+            _chunk(b"IHDR", header),
+            _chunk(b"PLTE", palette),
+            _chunk(b"IDAT", zlib.compress(scanlines, COMPRESSION_LEVEL)),
+            _chunk(b"IEND", b""),
+        )
+    )
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+
+
+class QuotaExceeded(Exception):
+    """Raised when a quota cannot be satisfied within this run"""
+
+
+class RateLimiter:
+    """Token bucket with rolling per-minute/hour/day quotas
+
+    `rate` tokens per second are added to a bucket holding at most `burst`
+    tokens; each acquire() takes one. The optional quotas cap how many
+    acquisitions may happen in any rolling window. When the server signals
+    throttling, throttled() halves the effective rate and pauses senders
+    with exponential backoff; succeeded() slowly restores the rate.
+    The limiter is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        rate=1.0,
+        burst=1,
+        per_minute=None,
+        per_hour=None,
+        per_day=None,
+        min_rate=0.05,
+        max_backoff=300.0,
+    ):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.min_rate = min(min_rate, self.rate)
+        self.max_backoff = max_backoff
+
+        # (window in seconds, limit, timestamps of acquisitions in window)
+        self._windows = [
+            (seconds, limit, deque())
+            for seconds, limit in ((60, per_minute), (3600, per_hour))
+            if limit
+        ]
+        self.per_day = per_day
+        self._day = deque()
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._current_rate = self.rate
+        self._backoff = 0.0
+        self._paused_until = 0.0
+        self._recent = deque()
+        self.throttle_count = 0
+
+    @property
+    def current_rate(self):
+        """Sends per second currently allowed, after adaptive backoff"""
+        return self._current_rate
+
+    def observed_rate(self):
+        """Sends per second over the last minute"""
+        with self._cond:
+            now = time.monotonic()
+            self._prune(self._recent, now - 60)
+            if not self._recent:
+                return 0.0
+            elapsed = max(now - self._recent[0], 1.0)
+            return len(self._recent) / elapsed
+
+    @staticmethod
+    def _prune(timestamps, cutoff):
+        while timestamps and timestamps[0] <= cutoff:
+            timestamps.popleft()
+
+    def seed_day(self, sent_times):
+        """Count earlier sends (wall-clock times) against the daily quota
+
+        The day window only lives in memory, so without this every new
+        process would start with a full daily allowance.
+        """
+        with self._cond:
+            if not self.per_day:
+                return
+            now = time.monotonic()
+            offset = now - time.time()
+            earlier = sorted(t + offset for t in sent_times)
+            self._day = deque(sorted(list(self._day) + earlier))
+            self._prune(self._day, now - 86400)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.burst, self._tokens + elapsed * self._current_rate)
+        self._updated = now
+
+    def _wait_time(self, now):
+        """Seconds until the next acquisition is allowed"""
+        wait = max(0.0, self._paused_until - now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self._current_rate)
+        for seconds, limit, timestamps in self._windows:
+            self._prune(timestamps, now - seconds)
+            if len(timestamps) >= limit:
+                wait = max(wait, timestamps[0] + seconds - now)
+        return wait
+
+    def acquire(self):
+        """Block until one more send is allowed
+
+        Raises QuotaExceeded once the daily quota is used up, since waiting
+        for it to roll over is not useful within one run.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.per_day:
+                    self._prune(self._day, now - 86400)
+                    if len(self._day) >= self.per_day:
+                        raise QuotaExceeded(
+                            f"Daily sending quota of {self.per_day} reached"
+                        )
+
+                self._refill(now)
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+
+            self._tokens -= 1
+            for _, _, timestamps in self._windows:
+                timestamps.append(now)
+            if self.per_day:
+                self._day.append(now)
+            # Only the last minute is needed for observed_rate()
+            self._prune(self._recent, now - 60)
+            self._recent.append(now)
+
+    def throttled(self, pause=None):
+        """Back off after the server replied with a throttling (4xx) code
+
+        Senders are paused with exponential backoff, or for `pause` seconds
+        when the server said how long to wait.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self.throttle_count += 1
+            self._refill(now)
+            self._current_rate = max(self.min_rate, self._current_rate / 2)
+            if pause is None:
+                self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+                pause = self._backoff
+            self._paused_until = max(self._paused_until, now + pause)
+
+    def succeeded(self):
+        """Recover towards the configured rate after an accepted message"""
+        with self._cond:
+            if self._current_rate < self.rate or self._backoff:
+                self._refill(time.monotonic())
+                self._current_rate = min(self.rate, self._current_rate * 1.1)
+                self._backoff = self._backoff / 2 if self._backoff > 1 else 0.0
+                self._cond.notify_all()
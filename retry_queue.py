@@ -0,0 +1,71 @@
+import heapq
+import itertools
+import random
+import smtplib
+import time
+
+# Failure categories returned by classify_error()
+TRANSIENT = "transient"  # 4xx reply, worth retrying later
+PERMANENT = "permanent"  # 5xx reply or anything unexpected
+CONNECTION = "connection"  # network or session trouble, worth retrying
+
+
+def classify_error(error):
+    """Sort a send failure into TRANSIENT, PERMANENT or CONNECTION"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return TRANSIENT if codes and all(400 <= c < 500 for c in codes) else PERMANENT
+    if isinstance(error, smtplib.SMTPResponseException):
+        return TRANSIENT if 400 <= error.smtp_code < 500 else PERMANENT
+    if isinstance(error, (smtplib.SMTPServerDisconnected, OSError)):
+        return CONNECTION
+    return PERMANENT
+
+
+class RetryPolicy:
+    """How often and how long to wait before retrying a failed send
+
+    Delays grow exponentially from `base_delay` up to `max_delay`, with
+    +/- `jitter` (a fraction) randomization so retries do not arrive at the
+    relay in lockstep.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=5.0, max_delay=300.0, jitter=0.5):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def should_retry(self, category, attempts):
+        return category != PERMANENT and attempts < self.max_attempts
+
+    def delay(self, attempts):
+        """Seconds to wait after the given number of failed attempts"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class RetryQueue:
+    """Jobs waiting for their backoff delay to pass, earliest first"""
+
+    def __init__(self):
+        self._heap = []
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, job, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._order), job))
+
+    def pop_ready(self):
+        """Remove and return the next job whose delay has passed, or None"""
+        if self._heap and self._heap[0][0] <= time.monotonic():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def seconds_until_ready(self):
+        """Seconds until the next job is ready, or None when empty"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
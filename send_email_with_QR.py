@@ -1,9 +1,11 @@
+import argparse
+import csv
+import html
 import os
 import smtplib
 import time
 from email import encoders
 from email.mime.base import MIMEBase
-from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
@@ -11,6 +13,26 @@ import gspread
 from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
 
+from attachment_cache import AttachmentCache
+from email_dispatcher import EmailDispatcher, SendJob
+from generate_QR import (
+    QR_FORMATS,
+    find_qr_file,
+    qr_filename,
+    render_qr,
+    render_qr_png,
+)
+from message_factory import MessageFactory, qr_mime_type
+from participant_source import open_configured_file_source
+from participant_table import ParticipantTable
+from rate_limiter import QuotaExceeded, RateLimiter
+from retry_queue import RetryPolicy
+from send_journal import SendJournal
+from sheet_writer import SheetWriteBuffer
+from sheets_client import instrument_client, metrics as sheets_metrics
+from smtp_pool import SMTPConnectionPool
+from template_engine import TemplateCache
+
 # Load environment variables from .env.local
 load_dotenv(".env.local")
 
@@ -26,13 +48,54 @@ SHEET_NAME = os.getenv("SHEET_NAME", "Sheet1")
 # Email configuration
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+EMAIL_SUBJECT = os.getenv("EMAIL_SUBJECT", "Event Confirmation - QR Code Attached")
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+# Messages sent over one authenticated connection before it is recycled
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(
+    os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100")
+)
+# Number of messages sent concurrently, each over its own connection
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "1"))
+
+# Sending rate limits, shared by all workers (empty quota = no limit)
+SEND_RATE_PER_SECOND = float(os.getenv("SEND_RATE_PER_SECOND", "1"))
+SEND_BURST = int(os.getenv("SEND_BURST", "1"))
+SEND_MAX_PER_MINUTE = int(os.getenv("SEND_MAX_PER_MINUTE") or 0)
+SEND_MAX_PER_HOUR = int(os.getenv("SEND_MAX_PER_HOUR") or 0)
+SEND_MAX_PER_DAY = int(os.getenv("SEND_MAX_PER_DAY") or 0)
+
+# Every send attempt is journaled here so interrupted runs resume safely
+SEND_JOURNAL_PATH = os.getenv("SEND_JOURNAL_PATH", "send_journal.jsonl")
+SEND_JOURNAL_FSYNC_EVERY = int(os.getenv("SEND_JOURNAL_FSYNC_EVERY", "20"))
+
+# Transient (4xx) and connection failures are retried with exponential
+# backoff; rows that still fail are listed in the failure report
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "4"))
+SEND_RETRY_BASE_DELAY = float(os.getenv("SEND_RETRY_BASE_DELAY", "5"))
+SEND_RETRY_MAX_DELAY = float(os.getenv("SEND_RETRY_MAX_DELAY", "300"))
+FAILURE_REPORT_PATH = os.getenv("FAILURE_REPORT_PATH", "failed_sends.csv")
+
+# email_sent updates are written back in batches of this many rows,
+# or after this many seconds, whichever comes first
+SHEET_FLUSH_ROWS = int(os.getenv("SHEET_FLUSH_ROWS", "50"))
+SHEET_FLUSH_SECONDS = float(os.getenv("SHEET_FLUSH_SECONDS", "10"))
 
 # File paths
 QR_CODES_DIR = os.getenv("QR_CODES_DIR", "qr_codes")
 PDF_ATTACHMENT_PATH = os.getenv("PDF_ATTACHMENT_PATH", "event-schedule.pdf")
 EMAIL_TEMPLATE_PATH = os.getenv("EMAIL_TEMPLATE_PATH", "email_template.html")
+# Files attached unchanged to every email (comma separated)
+STATIC_ATTACHMENTS = [
+    path.strip()
+    for path in os.getenv("STATIC_ATTACHMENTS", PDF_ATTACHMENT_PATH).split(",")
+    if path.strip()
+]
+
+# Static attachments are read and base64-encoded once per file version
+attachment_cache = AttachmentCache()
+# The email template is compiled once per file version
+template_cache = TemplateCache()
 
 # Validate email configuration
 if not SENDER_EMAIL or not SENDER_PASSWORD:
@@ -40,77 +103,217 @@ if not SENDER_EMAIL or not SENDER_PASSWORD:
 
 
 def authenticate_google_sheets():
-    """Authenticate and return Google Sheets client"""
+    """Authenticate and return a quota-aware Google Sheets client"""
     creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    return gspread.authorize(creds)
+    return instrument_client(gspread.authorize(creds))
+
+
+def create_smtp_pool(max_size=1):
+    """Create a pool of authenticated SMTP connections"""
+    return SMTPConnectionPool(
+        SMTP_SERVER,
+        SMTP_PORT,
+        SENDER_EMAIL,
+        SENDER_PASSWORD,
+        max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION,
+        max_size=max_size,
+    )
+
+
+def create_rate_limiter(journal=None):
+    """Create the rate limiter configured in .env.local
+
+    Sends the journal recorded in the last 24 hours, including those of
+    earlier runs, count against the daily quota.
+    """
+    limiter = RateLimiter(
+        rate=SEND_RATE_PER_SECOND,
+        burst=SEND_BURST,
+        per_minute=SEND_MAX_PER_MINUTE,
+        per_hour=SEND_MAX_PER_HOUR,
+        per_day=SEND_MAX_PER_DAY,
+    )
+    if journal is not None:
+        limiter.seed_day(journal.sent_since(86400))
+    return limiter
+
+
+def create_retry_policy():
+    """Create the retry policy configured in .env.local"""
+    return RetryPolicy(
+        max_attempts=SEND_MAX_ATTEMPTS,
+        base_delay=SEND_RETRY_BASE_DELAY,
+        max_delay=SEND_RETRY_MAX_DELAY,
+    )
+
+
+def write_failure_report(failures, path=None):
+    """Write the rows that could not be sent to a CSV report"""
+    path = path or FAILURE_REPORT_PATH
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["row", "unique_id", "email", "attempts", "category", "error"])
+        for result in sorted(failures, key=lambda r: r.job.row):
+            job = result.job
+            writer.writerow(
+                [
+                    job.row,
+                    job.unique_id,
+                    job.recipient_email,
+                    result.attempts,
+                    result.category,
+                    str(result.error),
+                ]
+            )
+    return path
+
+
+def is_throttling_error(error):
+    """Whether the SMTP server asked us to slow down (4xx reply)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+    elif isinstance(error, smtplib.SMTPResponseException):
+        codes = [error.smtp_code]
+    else:
+        return False
+    return any(400 <= code < 500 for code in codes)
+
 
+def load_email_template(name, fields=None):
+    """Render the email body from the template file
 
-def load_email_template(name):
-    """Load email body from template file"""
+    `fields` maps sheet column names to the recipient's values and fills
+    placeholders such as {unique_id} or {seat}; {name} is always set.
+    The template is compiled once and reloaded only when the file changes.
+    """
+    values = dict(fields or {})
+    values["name"] = name
     try:
-        with open(EMAIL_TEMPLATE_PATH, "r", encoding="utf-8") as f:
-            template = f.read()
-            # Replace placeholder with actual name
-            html_body = template.replace("{name}", name)
-            return html_body
+        return template_cache.get(EMAIL_TEMPLATE_PATH).render(values)
     except FileNotFoundError:
         print(f"Error: Email template file not found at {EMAIL_TEMPLATE_PATH}")
         # Return a basic template as fallback
-        return f"<html><body><h1>Hello {name}</h1><p>Please find your QR code attached.</p></body></html>"
+        return f"<html><body><h1>Hello {html.escape(name)}</h1><p>Please find your QR code attached.</p></body></html>"
+
+
+def build_email_message(
+    recipient_email, name, qr_image_path, pdf_path, qr_image_data=None, fields=None
+):
+    """Build the email with QR code image and PDF attachment
+
+    With `qr_image_data` the QR code is attached from those bytes instead
+    of being read from `qr_image_path`, which then only names it; its
+    extension sets the MIME type (PNG, SVG or PDF).
+    `pdf_path` may also be a list of static attachment paths, and `fields`
+    holds the recipient's sheet row for template placeholders.
+    """
+    # Create message
+    msg = MIMEMultipart("related")
+    msg["From"] = SENDER_EMAIL
+    msg["To"] = recipient_email
+    msg["Subject"] = EMAIL_SUBJECT
+
+    # Create alternative part for HTML
+    msg_alternative = MIMEMultipart("alternative")
+    msg.attach(msg_alternative)
+
+    # Attach HTML body from template
+    html_body = load_email_template(name, fields)
+    msg_alternative.attach(MIMEText(html_body, "html"))
+
+    # Attach QR code image
+    if qr_image_data is None and os.path.exists(qr_image_path):
+        with open(qr_image_path, "rb") as attachment:
+            qr_image_data = attachment.read()
+
+    if qr_image_data is not None:
+        maintype, subtype = qr_mime_type(qr_image_path).split("/")
+        img = MIMEBase(maintype, subtype, name=os.path.basename(qr_image_path))
+        img.set_payload(qr_image_data)
+        encoders.encode_base64(img)
+        img.add_header("Content-ID", "<qr_code>")
+        img.add_header(
+            "Content-Disposition",
+            "inline",
+            filename=os.path.basename(qr_image_path),
+        )
+        msg.attach(img)
+    else:
+        print(f"Warning: QR code image not found: {qr_image_path}")
+
+    # Attach PDF and any other static files from the encoded cache
+    pdf_paths = [pdf_path] if isinstance(pdf_path, str) else pdf_path
+    for path in pdf_paths:
+        part = attachment_cache.mime_part(path)
+        if part is not None:
+            msg.attach(part)
+        else:
+            print(f"Warning: PDF file not found: {path}")
+
+    return msg
+
+
+def create_message_factory():
+    """Create a factory that reuses the invariant parts of every email"""
+    factory = MessageFactory(
+        SENDER_EMAIL, EMAIL_SUBJECT, attachment_cache, STATIC_ATTACHMENTS
+    )
+    for path in factory.missing_attachments:
+        print(f"Warning: PDF file not found: {path}")
+    return factory
+
+
+def benchmark_message_build(count=2000):
+    """Compare messages built per second with and without MessageFactory"""
+    unique_id = "00000000-0000-4000-8000-000000000000"
+    qr_image_data = render_qr_png(unique_id)
+    fields = {"name": "Benchmark", "email": "bench@example.com"}
+
+    start = time.perf_counter()
+    for _ in range(count):
+        build_email_message(
+            "bench@example.com",
+            "Benchmark",
+            "qr_00000000.png",
+            STATIC_ATTACHMENTS,
+            qr_image_data,
+            fields,
+        ).as_bytes()
+    legacy = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    factory = create_message_factory()
+    for _ in range(count):
+        factory.build(
+            "bench@example.com",
+            load_email_template("Benchmark", fields),
+            qr_image_data,
+            "qr_00000000.png",
+        )
+    prebuilt = count / (time.perf_counter() - start)
 
+    print(f"build_email_message + as_bytes: {legacy:,.0f} messages/sec")
+    print(f"MessageFactory.build:           {prebuilt:,.0f} messages/sec")
+    print(f"Speedup: {prebuilt / legacy:.1f}x")
 
-def send_email_with_qr_and_pdf(recipient_email, name, qr_image_path, pdf_path):
-    """Send email with QR code image and PDF attachment"""
-    try:
-        # Create message
-        msg = MIMEMultipart("related")
-        msg["From"] = SENDER_EMAIL
-        msg["To"] = recipient_email
-        msg["Subject"] = os.getenv(
-            "EMAIL_SUBJECT", "Event Confirmation - QR Code Attached"
-        )
 
-        # Create alternative part for HTML
-        msg_alternative = MIMEMultipart("alternative")
-        msg.attach(msg_alternative)
-
-        # Attach HTML body from template
-        html_body = load_email_template(name)
-        msg_alternative.attach(MIMEText(html_body, "html"))
-
-        # Attach QR code image
-        if os.path.exists(qr_image_path):
-            with open(qr_image_path, "rb") as attachment:
-                img = MIMEImage(attachment.read(), name=os.path.basename(qr_image_path))
-                img.add_header("Content-ID", "<qr_code>")
-                img.add_header(
-                    "Content-Disposition",
-                    "inline",
-                    filename=os.path.basename(qr_image_path),
-                )
-                msg.attach(img)
-        else:
-            print(f"Warning: QR code image not found: {qr_image_path}")
-
-        # Attach PDF
-        if os.path.exists(pdf_path):
-            with open(pdf_path, "rb") as attachment:
-                part = MIMEBase("application", "octet-stream")
-                part.set_payload(attachment.read())
-                encoders.encode_base64(part)
-                part.add_header(
-                    "Content-Disposition",
-                    f"attachment; filename= {os.path.basename(pdf_path)}",
-                )
-                msg.attach(part)
-        else:
-            print(f"Warning: PDF file not found: {pdf_path}")
+def send_email_with_qr_and_pdf(
+    recipient_email, name, qr_image_path, pdf_path, pool=None
+):
+    """Send email with QR code image and PDF attachment
+
+    Pass a pool from create_smtp_pool() to reuse its connections; without
+    one a connection is opened and closed just for this message.
+    """
+    try:
+        msg = build_email_message(recipient_email, name, qr_image_path, pdf_path)
 
         # Send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SENDER_EMAIL, SENDER_PASSWORD)
-            server.send_message(msg)
+        if pool is not None:
+            pool.send_message(msg)
+        else:
+            with create_smtp_pool() as one_off_pool:
+                one_off_pool.send_message(msg)
 
         return True
 
@@ -119,100 +322,275 @@ def send_email_with_qr_and_pdf(recipient_email, name, qr_image_path, pdf_path):
         return False
 
 
-def send_emails_with_qr_codes():
-    """Send emails with QR codes to all recipients"""
-    try:
-        # Authenticate
-        client = authenticate_google_sheets()
+class MissingQRCode(Exception):
+    """Raised when a row's QR code image has not been generated"""
+
+
+def send_job(job, qr_image_data, pool, limiter, factory, journal, qr_name=None):
+    """Build and send one SendJob's email, journaling the SMTP outcome
 
-        # Open spreadsheet
-        spreadsheet = client.open(SPREADSHEET_NAME)
-        sheet = spreadsheet.worksheet(SHEET_NAME)
+    `qr_name` is the attachment's filename (default: qr_filename()).
+    Raises on failure so the caller can classify and retry it.
+    """
+    html_body = load_email_template(job.name, job.fields)
+    msg_bytes = factory.build(
+        job.recipient_email,
+        html_body,
+        qr_image_data,
+        qr_name or qr_filename(job.unique_id),
+    )
+    # Pace sends to avoid spam marking and provider throttling
+    limiter.acquire()
+    try:
+        pool.sendmail(SENDER_EMAIL, [job.recipient_email], msg_bytes)
+    except Exception as e:
+        journal.record(job, "failed", getattr(e, "smtp_code", None), str(e))
+        if is_throttling_error(e):
+            limiter.throttled()
+        raise
+    # Journal the acceptance before anything else can go wrong
+    journal.record(job, "sent", 250)
+    limiter.succeeded()
+
+
+def check_send_headers(headers, required=("unique_id", "email", "name")):
+    """Whether a sheet has the columns sending needs, printing why not"""
+    if not headers:
+        print("Sheet is empty!")
+        return False
+    for col_name in required:
+        if col_name not in headers:
+            print(f"Error: '{col_name}' column not found!")
+            return False
+    return True
+
+
+def find_send_columns(table):
+    """Locate the columns sending needs, adding email_sent if missing
+
+    Returns (required_cols, email_sent_col) where required_cols maps
+    unique_id, email and name to 0-based indexes and email_sent_col is
+    1-based, or None (after printing why) when the sheet is unusable.
+    """
+    # Get headers
+    headers = table.headers
+
+    if not check_send_headers(headers):
+        return None
+
+    print(f"Columns: {headers}")
+
+    # Find required columns
+    required_cols = {
+        col_name: headers.index(col_name) for col_name in ("unique_id", "email", "name")
+    }
+
+    # Check if email_sent column exists, if not create it
+    if "email_sent" not in headers:
+        email_sent_col = table.ensure_column("email_sent")
+        print(f"Created 'email_sent' column at column {email_sent_col}")
+    else:
+        email_sent_col = headers.index("email_sent") + 1
+
+    return required_cols, email_sent_col
+
+
+def collect_send_jobs(
+    headers, rows, required_cols, email_sent_col, skipped, journal=None, journaled=None
+):
+    """Yield a SendJob for every row that still needs an email
+
+    `rows` yields (row_number, values) pairs as ParticipantSource.iter_rows
+    does. Rows already marked as sent are appended to `skipped`. Rows the
+    journal shows as sent but the sheet does not are skipped as well and
+    appended to `journaled` so their status can be written back.
+    """
+    unique_id_col = required_cols["unique_id"]
+    email_col = required_cols["email"]
+    name_col = required_cols["name"]
+    index = 0
+
+    for row_number, row_data in rows:
+        # Get email status
+        email_sent_status = ""
+        if email_sent_col - 1 < len(row_data):
+            email_sent_status = row_data[email_sent_col - 1].strip().lower()
+
+        # Skip if already sent
+        if email_sent_status == "yes":
+            print(f"⊘ Row {row_number}: Already sent, skipping...")
+            skipped.append(row_number)
+            continue
+
+        if (
+            unique_id_col < len(row_data)
+            and email_col < len(row_data)
+            and name_col < len(row_data)
+        ):
+            unique_id = row_data[unique_id_col]
+            recipient_email = row_data[email_col].strip()
+            name = row_data[name_col]
+
+            if journal and journal.is_sent(unique_id, recipient_email):
+                print(f"⊘ Row {row_number}: Already sent (journal), skipping...")
+                skipped.append(row_number)
+                if journaled is not None:
+                    journaled.append(row_number)
+                continue
 
-        # Get all values
-        all_values = sheet.get_all_values()
+            if unique_id and recipient_email:
+                fields = dict(zip(headers, row_data))
+                yield SendJob(
+                    index, row_number, recipient_email, name, unique_id, fields
+                )
+                index += 1
 
-        if not all_values:
-            print("Sheet is empty!")
-            return
 
-        # Get headers
-        headers = all_values[0]
-        print(f"Columns: {headers}")
+def send_emails_with_qr_codes(
+    workers=None, table=None, stream=False, persist=False, output_format=None
+):
+    """Send emails with QR codes to all recipients
 
-        # Find required columns
-        required_cols = {"unique_id": None, "email": None, "name": None}
-        for col_name in required_cols:
-            if col_name in headers:
-                required_cols[col_name] = headers.index(col_name)
-            else:
-                print(f"Error: '{col_name}' column not found!")
-                return
-
-        # Check if email_sent column exists, if not create it
-        if "email_sent" not in headers:
-            email_sent_col = len(headers) + 1
-            sheet.update_cell(1, email_sent_col, "email_sent")
-            print(f"Created 'email_sent' column at column {email_sent_col}")
-        else:
-            email_sent_col = headers.index("email_sent") + 1
+    `workers` sets how many messages are sent concurrently, each over its
+    own SMTP connection; it defaults to SEND_WORKERS. Pass a
+    ParticipantSource to reuse an already downloaded sheet or send to the
+    participants in a local file.
 
-        # Send emails
-        print(f"\nSending emails...")
-        sent_count = 0
-        skipped_count = 0
+    With `stream` each QR code is rendered in memory just before its email
+    is built instead of being read from QR_CODES_DIR, so only a handful of
+    images are held at once and nothing touches the disk unless `persist`
+    also saves each rendered image to QR_CODES_DIR.
 
-        for row_idx in range(1, len(all_values)):  # Start from row 1 (skip header)
-            row_data = all_values[row_idx]
+    `output_format` picks the QR code format to render or attach. Without
+    it, streamed codes use QR_FORMAT and saved codes are found in any
+    format; a row whose code is missing fails. Returns True when no email
+    failed.
+    """
+    workers = max(1, workers or SEND_WORKERS)
+    sheets_usage = sheets_metrics.snapshot()
 
-            # Get email status
-            email_sent_status = ""
-            if email_sent_col - 1 < len(row_data):
-                email_sent_status = row_data[email_sent_col - 1].strip().lower()
+    try:
+        if table is None:
+            table = open_configured_file_source()
+        if table is None:
+            # Authenticate
+            client = authenticate_google_sheets()
+
+            # Open spreadsheet
+            spreadsheet = client.open(SPREADSHEET_NAME)
+            table = ParticipantTable(spreadsheet.worksheet(SHEET_NAME))
+
+        columns = find_send_columns(table)
+        if columns is None:
+            return False
+        required_cols, email_sent_col = columns
+
+        # Send emails, each worker reusing its own authenticated connection
+        print(f"\nSending emails with {workers} worker(s)...")
+        sent_rows = []
+        failures = []
+        skipped_rows = []
+
+        journal = SendJournal(SEND_JOURNAL_PATH, SEND_JOURNAL_FSYNC_EVERY)
+        limiter = create_rate_limiter(journal)
+        factory = create_message_factory()
+
+        if stream and persist:
+            os.makedirs(QR_CODES_DIR, exist_ok=True)
+
+        def send(job):
+            if stream:
+                qr_name = qr_filename(job.unique_id, output_format)
+                qr_image_data = render_qr(job.unique_id, output_format)
+                if persist:
+                    with open(os.path.join(QR_CODES_DIR, qr_name), "wb") as f:
+                        f.write(qr_image_data)
+            else:
+                qr_path = find_qr_file(job.unique_id, QR_CODES_DIR, output_format)
+                if qr_path is None:
+                    missing = qr_filename(job.unique_id, output_format)
+                    raise MissingQRCode(
+                        f"QR code image not found: "
+                        f"{os.path.join(QR_CODES_DIR, missing)}"
+                    )
+                qr_name = os.path.basename(qr_path)
+                with open(qr_path, "rb") as f:
+                    qr_image_data = f.read()
+
+            send_job(job, qr_image_data, pool, limiter, factory, journal, qr_name)
+
+        journaled_rows = []
+        jobs = collect_send_jobs(
+            table.headers,
+            table.iter_rows(),
+            required_cols,
+            email_sent_col,
+            skipped_rows,
+            journal,
+            journaled_rows,
+        )
+        dispatcher = EmailDispatcher(
+            send, workers=workers, retry_policy=create_retry_policy()
+        )
 
-            # Skip if already sent
-            if email_sent_status == "yes":
-                print(f"⊘ Row {row_idx + 1}: Already sent, skipping...")
-                skipped_count += 1
-                continue
+        status_writer = SheetWriteBuffer(
+            table, flush_every=SHEET_FLUSH_ROWS, flush_interval=SHEET_FLUSH_SECONDS
+        )
 
-            # Get required data
-            unique_id_col = required_cols["unique_id"]
-            email_col = required_cols["email"]
-            name_col = required_cols["name"]
-
-            if (
-                unique_id_col < len(row_data)
-                and email_col < len(row_data)
-                and name_col < len(row_data)
-            ):
-                unique_id = row_data[unique_id_col]
-                recipient_email = row_data[email_col].strip()
-                name = row_data[name_col]
-
-                if unique_id and recipient_email:
-                    # Find QR code image
-                    qr_filename = f"qr_{unique_id[:8]}.png"
-                    qr_path = os.path.join(QR_CODES_DIR, qr_filename)
-
-                    # Send email
-                    if send_email_with_qr_and_pdf(
-                        recipient_email, name, qr_path, PDF_ATTACHMENT_PATH
-                    ):
-                        # Update sheet with status
-                        sheet.update_cell(row_idx + 1, email_sent_col, "yes")
-                        print(f"✓ Row {row_idx + 1}: Sent to {recipient_email}")
-                        sent_count += 1
+        try:
+            # Pending status updates are flushed even if the run is interrupted
+            with create_smtp_pool(max_size=workers) as pool, journal, status_writer:
+                # Results arrive on this thread, so sheet updates stay serial
+                for result in dispatcher.dispatch(jobs):
+                    job = result.job
+                    if result.success:
+                        # Queue sheet status update
+                        status_writer.set(job.row, email_sent_col, "yes")
+                        print(
+                            f"✓ Row {job.row}: Sent to {job.recipient_email} "
+                            f"({limiter.observed_rate():.2f}/s, "
+                            f"limit {limiter.current_rate:.2f}/s)"
+                        )
+                        sent_rows.append(job.row)
+                    elif isinstance(result.error, QuotaExceeded):
+                        print(f"⏸ {result.error}; remaining rows left for the next run")
+                        break
                     else:
+                        status_writer.maybe_flush()
                         print(
-                            f"✗ Row {row_idx + 1}: Failed to send to {recipient_email}"
+                            f"✗ Row {job.row}: Failed to send to "
+                            f"{job.recipient_email} after {result.attempts} "
+                            f"attempt(s) ({result.category}): {result.error}"
                         )
-
-                    # Add 1 second delay to prevent spam marking
-                    time.sleep(1)
-
-        print(f"\n✓ Emails sent: {sent_count}")
-        print(f"⊘ Emails skipped: {skipped_count}")
+                        failures.append(result)
+
+                # Catch the sheet up with sends only the journal knew about
+                for row in journaled_rows:
+                    status_writer.set(row, email_sent_col, "yes")
+        finally:
+            # Local participant files are rewritten once with every status
+            table.commit()
+
+        print(f"\n✓ Emails sent: {len(sent_rows)}")
+        print(f"⊘ Emails skipped: {len(skipped_rows)}")
+        if dispatcher.retries:
+            print(f"↻ Retries after transient failures: {dispatcher.retries}")
+        if failures:
+            report_path = write_failure_report(failures)
+            rows = sorted(result.job.row for result in failures)
+            print(f"✗ Emails failed: {len(failures)} (rows {rows})")
+            print(f"📄 Failure report written to {report_path}")
+        if limiter.throttle_count:
+            print(f"🐢 Server throttled sending {limiter.throttle_count} time(s)")
+        print(
+            f"🔌 SMTP connections opened: {pool.connections_opened} "
+            f"(logins: {pool.logins})"
+        )
+        print(
+            f"📝 Sheet status updates: {status_writer.cells_written} rows in "
+            f"{status_writer.api_calls} API call(s)"
+        )
+        return not failures
 
     except gspread.exceptions.SpreadsheetNotFound:
         print(f"Error: Spreadsheet '{SPREADSHEET_NAME}' not found.")
@@ -220,7 +598,48 @@ def send_emails_with_qr_codes():
         print(f"Error: Sheet '{SHEET_NAME}' not found.")
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        sheets_metrics.print_summary(since=sheets_usage)
+    return False
 
 
 if __name__ == "__main__":
-    send_emails_with_qr_codes()
+    parser = argparse.ArgumentParser(description="Send emails with QR codes")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=SEND_WORKERS,
+        help="number of concurrent SMTP connections (default: SEND_WORKERS)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="render QR codes in memory instead of reading them from disk",
+    )
+    parser.add_argument(
+        "--persist",
+        action="store_true",
+        help="with --stream, also save rendered QR codes to QR_CODES_DIR",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(QR_FORMATS),
+        help="QR code format to attach (default: whichever was generated)",
+    )
+    parser.add_argument(
+        "--benchmark-messages",
+        type=int,
+        metavar="N",
+        help="build N messages with and without the prebuilt skeleton, then exit",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark_messages:
+        benchmark_message_build(args.benchmark_messages)
+    else:
+        send_emails_with_qr_codes(
+            workers=args.workers,
+            stream=args.stream,
+            persist=args.persist,
+            output_format=args.format,
+        )
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+
+
+class SendJournal:
+    """Append-only JSONL log of every send attempt
+
+    Each attempt is written as soon as the SMTP server answers, before the
+    sheet is updated, so after a crash the journal knows exactly which
+    recipients already accepted a message. Lines are flushed immediately
+    and fsync'd every `fsync_every` records and on close. A partially
+    written last line (from a crash mid-write) is ignored on load.
+    """
+
+    def __init__(self, path, fsync_every=20):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self._sent = {}
+        self._attempts = {}
+        self._sent_times = []
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._load()
+        self._drop_partial_line()
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _key(unique_id, recipient_email):
+        return (unique_id, recipient_email.strip().lower())
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._apply(record)
+        except FileNotFoundError:
+            pass
+
+    def _drop_partial_line(self):
+        """Cut off a line left unterminated by a crash so appends stay valid"""
+        try:
+            with open(self.path, "rb+") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - 65536))
+                tail_start = f.tell()
+                tail = f.read()
+                if tail and not tail.endswith(b"\n"):
+                    f.truncate(tail_start + tail.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, record):
+        key = self._key(record["unique_id"], record["recipient"])
+        self._attempts[key] = max(self._attempts.get(key, 0), record["attempt"])
+        if record["status"] == "sent":
+            self._sent[key] = record
+            if "time" in record:
+                self._sent_times.append(record["time"])
+
+    def is_sent(self, unique_id, recipient_email):
+        """Whether this ID was already accepted for this address"""
+        return self._key(unique_id, recipient_email) in self._sent
+
+    @property
+    def sent_count(self):
+        return len(self._sent)
+
+    def sent_since(self, seconds):
+        """Wall-clock times of messages accepted in the last `seconds`"""
+        cutoff = time.time() - seconds
+        with self._lock:
+            return [t for t in self._sent_times if t > cutoff]
+
+    def record(self, job, status, smtp_code=None, error=None):
+        """Append the outcome of one attempt for a SendJob"""
+        with self._lock:
+            key = self._key(job.unique_id, job.recipient_email)
+            record = {
+                "time": time.time(),
+                "row": job.row,
+                "unique_id": job.unique_id,
+                "recipient": job.recipient_email,
+                "attempt": self._attempts.get(key, 0) + 1,
+                "status": status,
+                "smtp_code": smtp_code,
+                "error": error,
+            }
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            self._apply(record)
+
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,157 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gspread.utils import rowcol_to_a1
+
+# Bounds for a single batch_update request, well under the API payload limit
+MAX_RANGE_ROWS = 5000  # Longer runs are split into several ranges
+MAX_REQUEST_CELLS = 20000
+MAX_REQUEST_BYTES = 1_000_000
+
+
+def coalesce_cells(cells, max_rows=MAX_RANGE_ROWS):
+    """Turn {(row, col): value} into batch_update ranges
+
+    Cells in the same column on consecutive rows are merged into a single
+    range, so a contiguous block of updates costs one range entry. Runs
+    longer than `max_rows` are split. Columns past Z are addressed as AA,
+    AB and so on.
+    """
+    by_col = {}
+    for (row, col), value in cells.items():
+        by_col.setdefault(col, []).append((row, value))
+
+    ranges = []
+    for col in sorted(by_col):
+        run = []
+        for row, value in sorted(by_col[col]):
+            if run and (row != run[-1][0] + 1 or len(run) >= max_rows):
+                ranges.append(_column_run(run, col))
+                run = []
+            run.append((row, value))
+        ranges.append(_column_run(run, col))
+    return ranges
+
+
+def _column_run(run, col):
+    start = rowcol_to_a1(run[0][0], col)
+    end = rowcol_to_a1(run[-1][0], col)
+    return {
+        "range": start if start == end else f"{start}:{end}",
+        "values": [[value] for _, value in run],
+    }
+
+
+def _range_size(entry):
+    """Rough JSON size of a range entry, in bytes"""
+    return len(entry["range"]) + sum(
+        len(str(value)) + 4 for row in entry["values"] for value in row
+    )
+
+
+def chunk_ranges(ranges, max_cells=MAX_REQUEST_CELLS, max_bytes=MAX_REQUEST_BYTES):
+    """Group range entries into batch_update payloads of bounded size"""
+    chunks = []
+    chunk, cells, size = [], 0, 0
+    for entry in ranges:
+        entry_cells = sum(len(row) for row in entry["values"])
+        entry_size = _range_size(entry)
+        if chunk and (cells + entry_cells > max_cells or size + entry_size > max_bytes):
+            chunks.append(chunk)
+            chunk, cells, size = [], 0, 0
+        chunk.append(entry)
+        cells += entry_cells
+        size += entry_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def write_ranges(sheet, ranges, workers=1):
+    """Write range entries with size-bounded batch_update calls
+
+    Chunks are sent by up to `workers` threads at once (quota handling and
+    retries are done by the client, see sheets_client). Returns the number
+    of batch_update calls made.
+    """
+    chunks = chunk_ranges(ranges)
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            sheet.batch_update(chunk)
+        return len(chunks)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        futures = [executor.submit(sheet.batch_update, chunk) for chunk in chunks]
+        for future in futures:
+            future.result()
+    return len(chunks)
+
+
+class SheetWriteBuffer:
+    """Collect cell updates and write them to a participant source in one call
+
+    `target` is a ParticipantSource; for Google Sheets each flush is one
+    batch_update call unless it is large enough to need several.
+
+    Buffered cells are flushed once `flush_every` are pending or
+    `flush_interval` seconds have passed since the last flush, and always
+    when the buffer is used as a context manager and the block exits,
+    including on errors and Ctrl-C.
+    """
+
+    def __init__(self, target, flush_every=50, flush_interval=10.0):
+        self.target = target
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.api_calls = 0
+        self.cells_written = 0
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def set(self, row, col, value):
+        """Queue a cell update (1-based row and column)"""
+        with self._lock:
+            self._pending[(row, col)] = value
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """Flush if the size or time threshold has been reached"""
+        due = (
+            len(self._pending) >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+        if due and self._pending:
+            self.flush()
+
+    def flush(self):
+        """Write every pending update in as few API calls as possible"""
+        with self._lock:
+            cells, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not cells:
+            return
+
+        try:
+            calls = self.target.write_cells(cells)
+        except BaseException:
+            # Keep the updates so a later flush can retry them
+            with self._lock:
+                for cell, value in cells.items():
+                    self._pending.setdefault(cell, value)
+            raise
+
+        self.api_calls += calls or 1
+        self.cells_written += len(cells)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
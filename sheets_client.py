@@ -0,0 +1,239 @@
+import bisect
+import json
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+from gspread.exceptions import APIError
+
+from rate_limiter import RateLimiter
+
+# Load environment variables from .env.local
+load_dotenv(".env.local")
+
+# Google's default Sheets quota is 60 read and 60 write requests per minute
+# per user; requests are spaced out to stay under these
+SHEETS_READS_PER_MINUTE = int(os.getenv("SHEETS_READS_PER_MINUTE") or 60)
+SHEETS_WRITES_PER_MINUTE = int(os.getenv("SHEETS_WRITES_PER_MINUTE") or 60)
+SHEETS_MAX_ATTEMPTS = int(os.getenv("SHEETS_MAX_ATTEMPTS") or 6)
+
+# HTTP statuses worth retrying: quota exhausted and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503}
+
+# Upper bounds (milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class SheetsMetrics:
+    """Counters for the Sheets API requests made in this process"""
+
+    COUNTERS = (
+        "calls",
+        "reads",
+        "writes",
+        "bytes_sent",
+        "bytes_received",
+        "errors",
+        "retries",
+        "throttles",
+        "throttle_seconds",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_latency = 0.0
+
+    def record_call(self, method, sent, received, latency):
+        with self._lock:
+            self.calls += 1
+            if method.upper() == "GET":
+                self.reads += 1
+            else:
+                self.writes += 1
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.total_latency += latency
+            bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, latency * 1000)
+            self.latency_histogram[bucket] += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_throttle(self, seconds):
+        with self._lock:
+            self.throttles += 1
+            self.throttle_seconds += seconds
+
+    def snapshot(self):
+        """Copy of the current counters, to report one stage with since="""
+        copy = SheetsMetrics()
+        with self._lock:
+            for name in self.COUNTERS:
+                setattr(copy, name, getattr(self, name))
+            copy.latency_histogram = list(self.latency_histogram)
+            copy.total_latency = self.total_latency
+        return copy
+
+    def since(self, earlier):
+        """Counters accumulated after an earlier snapshot()"""
+        delta = self.snapshot()
+        for name in self.COUNTERS:
+            setattr(delta, name, getattr(delta, name) - getattr(earlier, name))
+        delta.latency_histogram = [
+            now - before
+            for now, before in zip(delta.latency_histogram, earlier.latency_histogram)
+        ]
+        delta.total_latency -= earlier.total_latency
+        return delta
+
+    def summary_lines(self):
+        average = self.total_latency / self.calls * 1000 if self.calls else 0.0
+        lines = [
+            f"Calls: {self.calls} ({self.reads} reads, {self.writes} writes), "
+            f"errors: {self.errors}, retries: {self.retries}",
+            f"Data: {_format_bytes(self.bytes_sent)} sent, "
+            f"{_format_bytes(self.bytes_received)} received",
+            f"Throttled: {self.throttles} time(s), "
+            f"{self.throttle_seconds:.1f}s waiting for quota",
+            f"Latency: {average:.0f} ms average",
+        ]
+        labels = [f"<{bound}ms" for bound in LATENCY_BUCKETS_MS]
+        labels.append(f">={LATENCY_BUCKETS_MS[-1]}ms")
+        for label, count in zip(labels, self.latency_histogram):
+            if count:
+                lines.append(f"   {label:>9}: {count}")
+        return lines
+
+    def print_summary(self, title="Sheets API usage", since=None):
+        """Print the counters, or only those after the `since` snapshot"""
+        stats = self.since(since) if since is not None else self
+        if not stats.calls and not stats.errors:
+            return
+        print(f"\n📡 {title}:")
+        for line in stats.summary_lines():
+            print(f"   {line}")
+
+
+def _format_bytes(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size} bytes"
+
+
+# Shared by every client in this process
+metrics = SheetsMetrics()
+
+
+def _request_size(kwargs):
+    if kwargs.get("json") is not None:
+        return len(json.dumps(kwargs["json"]))
+    data = kwargs.get("data")
+    return len(data) if data else 0
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class QuotaAwareTransport:
+    """Rate limited, retrying, instrumented stand-in for gspread's request()
+
+    Every Sheets/Drive API request made through the client passes through
+    here: it waits for the read or write quota, retries 429 and 5xx
+    replies with backoff (honouring Retry-After) and records metrics.
+    The retry delay pauses the shared limiter, so every thread using the
+    same quota waits it out once.
+    """
+
+    def __init__(
+        self,
+        request,
+        reads_per_minute=SHEETS_READS_PER_MINUTE,
+        writes_per_minute=SHEETS_WRITES_PER_MINUTE,
+        max_attempts=SHEETS_MAX_ATTEMPTS,
+        metrics=metrics,
+        base_delay=1.0,
+    ):
+        self._request = request
+        self.read_limiter = _quota_limiter(reads_per_minute)
+        self.write_limiter = _quota_limiter(writes_per_minute)
+        self.max_attempts = max(1, max_attempts)
+        self.metrics = metrics
+        self.base_delay = base_delay
+
+    def _limiter(self, method):
+        return self.read_limiter if method.upper() == "GET" else self.write_limiter
+
+    def __call__(self, method, endpoint, *args, **kwargs):
+        limiter = self._limiter(method)
+        for attempt in range(1, self.max_attempts + 1):
+            waited = time.monotonic()
+            limiter.acquire()
+            waited = time.monotonic() - waited
+            if waited > 0.01:
+                self.metrics.record_throttle(waited)
+
+            started = time.monotonic()
+            try:
+                response = self._request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                status = getattr(e.response, "status_code", None)
+                self.metrics.record_error()
+                if status not in RETRY_STATUS_CODES or attempt == self.max_attempts:
+                    raise
+                self.metrics.record_retry()
+                delay = _retry_after(e.response)
+                if delay is None:
+                    backoff = min(64.0, self.base_delay * 2 ** (attempt - 1))
+                    delay = backoff * random.uniform(0.5, 1.5)
+                print(
+                    f"⏳ Sheets API error {status}, retrying in {delay:.1f}s "
+                    f"(attempt {attempt}/{self.max_attempts})"
+                )
+                # The next acquire() waits out the pause
+                limiter.throttled(delay)
+                continue
+
+            limiter.succeeded()
+            self.metrics.record_call(
+                method,
+                _request_size(kwargs),
+                len(getattr(response, "content", b"") or b""),
+                time.monotonic() - started,
+            )
+            return response
+
+
+def _quota_limiter(per_minute):
+    # Allow short bursts, but never more than `per_minute` in any minute
+    return RateLimiter(
+        rate=per_minute / 60.0, burst=min(10, per_minute), per_minute=per_minute
+    )
+
+
+def instrument_client(client, **options):
+    """Route a gspread client's API requests through QuotaAwareTransport
+
+    Works with gspread 5 (client.request) and 6 (client.http_client);
+    spreadsheets and worksheets opened from the client are covered too.
+    Calling it again on the same client has no effect.
+    """
+    transport = getattr(client, "http_client", client)
+    if not isinstance(transport.request, QuotaAwareTransport):
+        transport.request = QuotaAwareTransport(transport.request, **options)
+    return client
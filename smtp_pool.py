@@ -0,0 +1,177 @@
+import queue
+import smtplib
+import threading
+from contextlib import contextmanager
+
+# SMTP reply codes that mean the server is dropping the session
+DISCONNECT_CODES = {421}
+
+
+def _is_rejection(error):
+    """Whether the server refused a message but kept the session open"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return (
+        isinstance(error, smtplib.SMTPResponseException)
+        and error.smtp_code not in DISCONNECT_CODES
+    )
+
+
+def _reset(server):
+    """Reset the SMTP transaction, returning False if the session is dead"""
+    try:
+        server.rset()
+        return True
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+class PooledConnection:
+    """An authenticated SMTP session plus the number of messages it has sent"""
+
+    def __init__(self, server):
+        self.server = server
+        self.messages_sent = 0
+
+    def close(self):
+        """Close the session, ignoring errors from an already dead server"""
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                self.server.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+
+class SMTPConnectionPool:
+    """Reuse authenticated SMTP connections across many messages
+
+    Connections are opened lazily, handed out one caller at a time and
+    recycled after `max_messages` messages or as soon as the server
+    disconnects (SMTPServerDisconnected or a 421 reply).
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        username=None,
+        password=None,
+        max_messages=100,
+        max_size=1,
+        use_tls=True,
+        timeout=30,
+        smtp_class=smtplib.SMTP,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_messages = max_messages
+        self.max_size = max_size
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.smtp_class = smtp_class
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Counters, useful for progress output and tests
+        self.connections_opened = 0
+        self.logins = 0
+        self.messages_sent = 0
+
+    def _connect(self):
+        """Open a new session, upgrade to TLS and log in"""
+        server = self.smtp_class(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+                with self._lock:
+                    self.logins += 1
+        except Exception:
+            PooledConnection(server).close()
+            raise
+
+        with self._lock:
+            self.connections_opened += 1
+        return PooledConnection(server)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a live connection, returning it to the pool afterwards"""
+        if self._closed:
+            raise RuntimeError("SMTP connection pool is closed")
+
+        self._slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+
+            yield conn
+
+            if conn.messages_sent >= self.max_messages or self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+        except BaseException as e:
+            # A plain rejection leaves the session usable once it is reset;
+            # anything else might leave it in an unknown state
+            if conn is not None:
+                if _is_rejection(e) and _reset(conn.server):
+                    self._idle.put(conn)
+                else:
+                    conn.close()
+            raise
+        finally:
+            self._slots.release()
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        """Send an email.message.Message, reconnecting once on disconnect"""
+        return self._send(lambda server: server.send_message(msg, from_addr, to_addrs))
+
+    def sendmail(self, from_addr, to_addrs, msg_bytes):
+        """Send an already serialized message, reconnecting once on disconnect"""
+        return self._send(
+            lambda server: server.sendmail(from_addr, to_addrs, msg_bytes)
+        )
+
+    def _send(self, send):
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    refused = send(conn.server)
+                    conn.messages_sent += 1
+                with self._lock:
+                    self.messages_sent += 1
+                return refused
+            except smtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code not in DISCONNECT_CODES or attempt:
+                    raise
+
+    def close(self):
+        """Close every idle connection and refuse new borrows"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,67 @@
+import os
+import socket
+import sys
+
+import pytest
+
+# The project is a set of top-level scripts; make them importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# send_email_with_QR refuses to load without a sender configured; this runs
+# before any test module imports it
+os.environ.setdefault("SENDER_EMAIL", "sender@example.com")
+os.environ.setdefault("SENDER_PASSWORD", "secret")
+
+
+class CountingHandler:
+    """Counts sessions, logins and messages; can answer 421 to some DATA"""
+
+    def __init__(self):
+        self.sessions = 0
+        self.logins = 0
+        self.messages = 0
+        self.received = []  # Raw bytes of every accepted message
+        self.disconnect_on = set()  # 1-based DATA commands answered with 421
+        self._data_commands = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self._data_commands += 1
+        if self._data_commands in self.disconnect_on:
+            return "421 Service closing transmission channel"
+        self.messages += 1
+        self.received.append(envelope.original_content)
+        return "250 OK"
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        from aiosmtpd.smtp import AuthResult
+
+        self.logins += 1
+        return AuthResult(success=True)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    """A local aiosmtpd server accepting any login: (handler, port)"""
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    handler = CountingHandler()
+    controller = controller_module.Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=_free_port(),
+        authenticator=handler.authenticate,
+        auth_require_tls=False,
+    )
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
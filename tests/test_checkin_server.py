@@ -0,0 +1,91 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import generate_uniqueId
+from checkin_server import CheckinIndex, create_server
+from generate_uniqueId import generate_unique_ids, verify_signed_id
+
+
+@pytest.fixture
+def signed_ids(monkeypatch):
+    monkeypatch.setattr(generate_uniqueId, "ID_SIGNING_KEY", "door-secret")
+    return generate_unique_ids(3, "signed")
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(index):
+        server = create_server(index, "127.0.0.1", 0, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return http.client.HTTPConnection(*server.server_address[:2])
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _forge(unique_id):
+    """The same ID with the last character of its tag changed"""
+    return unique_id[:-1] + ("b" if unique_id[-1] == "a" else "a")
+
+
+def _request(conn, method, path):
+    conn.request(method, path)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_check_in_then_duplicate_and_unknown(server):
+    conn = server(CheckinIndex.from_ids(["id-a", "id-b"]))
+
+    assert _request(conn, "GET", "/validate/id-a")[1]["status"] == "valid"
+    assert _request(conn, "POST", "/checkin/id-a")[1]["status"] == "ok"
+    status, body = _request(conn, "POST", "/checkin/id-a")
+    assert (status, body["status"], body["scans"]) == (200, "duplicate", 2)
+    assert _request(conn, "POST", "/checkin/nope")[0] == 404
+
+    stats = _request(conn, "GET", "/stats")[1]
+    assert (stats["checked_in"], stats["duplicates"], stats["unknown"]) == (1, 1, 1)
+
+
+def test_signed_ids_with_a_bad_tag_are_refused(server, signed_ids):
+    index = CheckinIndex.from_ids(signed_ids)
+    index.verify = verify_signed_id
+    conn = server(index)
+
+    good = signed_ids[0]
+    payload = good.rpartition("-")[0]
+
+    assert _request(conn, "POST", f"/checkin/{good}")[1]["status"] == "ok"
+    status, body = _request(conn, "POST", f"/checkin/{_forge(good)}")
+    assert (status, body["status"]) == (403, "forged")
+    assert _request(conn, "GET", f"/validate/{payload}")[0] == 403
+    assert _request(conn, "GET", "/stats")[1]["forged"] == 2
+
+
+def test_load_verifies_signatures_only_for_signed_ids(monkeypatch, signed_ids):
+    class Source:
+        headers = ["name", "email", "unique_id"]
+
+        def ensure_column(self, name):
+            self.headers = self.headers + [name]
+            return len(self.headers)
+
+        def iter_rows(self):
+            for row, unique_id in enumerate(signed_ids, start=2):
+                yield row, ["Guest", "guest@x.org", unique_id]
+
+    monkeypatch.setattr(generate_uniqueId, "ID_FORMAT", "signed")
+    index = CheckinIndex.load(Source())
+    assert index.check_in(signed_ids[1])["status"] == "ok"
+    assert index.check_in(_forge(signed_ids[1]))["status"] == "forged"
+
+    monkeypatch.setattr(generate_uniqueId, "ID_FORMAT", "uuid4")
+    assert CheckinIndex.load(Source()).verify is None
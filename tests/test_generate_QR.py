@@ -0,0 +1,51 @@
+import io
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from generate_QR import QR_SETTINGS, QRRenderer, render_qr
+from verify_QR import decode_qr_image
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    """Switch threads often enough that unsafe sharing shows up every run"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_threads_render_their_own_codes(tmp_path, frequent_thread_switches):
+    unique_ids = [str(uuid.UUID(int=n)) for n in range(200)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        images = list(
+            pool.map(lambda unique_id: render_qr(unique_id, "png"), unique_ids)
+        )
+
+    for unique_id, image in zip(unique_ids, images):
+        path = tmp_path / f"{unique_id}.png"
+        path.write_bytes(image)
+        assert decode_qr_image(str(path)) == unique_id
+
+
+UNIQUE_IDS = [
+    "11111111-1111-4111-8111-111111111111",
+    "short",
+    "a much longer participant code that needs a bigger symbol",
+]
+
+
+@pytest.mark.parametrize("unique_id", UNIQUE_IDS)
+def test_raw_and_pil_backends_draw_the_same_pixels(unique_id):
+    images = []
+    for backend in ("raw", "pil"):
+        renderer = QRRenderer(dict(QR_SETTINGS, backend=backend, format="png"))
+        with Image.open(io.BytesIO(renderer.render_png(unique_id))) as img:
+            images.append((img.size, img.convert("RGB").tobytes()))
+
+    assert images[0] == images[1]
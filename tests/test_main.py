@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import participant_source
+from main import QRCodeManager, build_parser, run_command
+
+
+@pytest.fixture
+def unusable_sheet(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "participants.csv"
+    path.write_text("name,phone\nAna,123\n", encoding="utf-8")
+    monkeypatch.setattr(participant_source, "PARTICIPANT_SOURCE", str(path))
+    return path
+
+
+def test_all_fails_on_an_unusable_sheet(unusable_sheet):
+    assert run_command(build_parser().parse_args(["all"])) == 1
+
+
+def test_menu_workflow_does_not_report_success_on_an_unusable_sheet(
+    unusable_sheet, monkeypatch, capsys
+):
+    monkeypatch.setattr("builtins.input", lambda prompt="": "y")
+    QRCodeManager().run_complete_workflow()
+    out = capsys.readouterr().out
+    assert "SUCCESSFULLY" not in out
+    assert "Workflow did not complete" in out
+
+
+@pytest.mark.parametrize(
+    "action, module, stage",
+    [
+        ("generate_unique_ids", "generate_uniqueId", "add_unique_ids_to_sheet"),
+        ("generate_qr_codes", "generate_QR", "generate_qr_codes_from_sheet"),
+        ("send_emails", "send_email_with_QR", "send_emails_with_qr_codes"),
+    ],
+)
+@pytest.mark.parametrize("result", [True, False])
+def test_menu_stage_reports_what_the_stage_returned(
+    monkeypatch, capsys, action, module, stage, result
+):
+    monkeypatch.setattr(QRCodeManager, "check_prerequisites", lambda self, step: [])
+    monkeypatch.setattr(f"{module}.{stage}", lambda: result)
+    monkeypatch.setattr(
+        "builtins.input", lambda prompt="": "SEND" if "SEND" in prompt else "y"
+    )
+    getattr(QRCodeManager(), action)()
+    out = capsys.readouterr().out
+    assert ("completed successfully" in out) is result
+    assert ("did not complete" in out) is not result
+
+
+# Loaded by the IDs, QR and send stages only; status must not pay for them
+HEAVY_MODULES = ("gspread", "google", "qrcode", "smtplib", "PIL")
+
+
+def test_status_does_not_import_stage_modules(tmp_path):
+    main_py = os.path.join(os.path.dirname(os.path.dirname(__file__)), "main.py")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", main_py, "status"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+
+    # -X importtime writes "import time: self | cumulative | module" lines
+    imported = {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+    assert "argparse" in imported
+    heavy = sorted(name for name in imported if name.split(".")[0] in HEAVY_MODULES)
+    assert heavy == []
@@ -0,0 +1,31 @@
+import email
+from email import policy
+import re
+
+from message_factory import MessageFactory
+
+SUBJECT = (
+    "Ihre Eintrittskarte für das Sommerfest – bitte den QR-Code am Eingang vorzeigen"
+)
+
+
+def _message(subject=SUBJECT):
+    factory = MessageFactory("events@example.com", subject, {})
+    return factory.build("guest@example.com", "<p>Hallo</p>", b"\x89PNG", "qr_a.png")
+
+
+def test_lines_end_with_crlf_only():
+    raw = _message()
+    assert re.search(rb"(?<!\r)\n", raw) is None
+    assert re.search(rb"\r(?!\n)", raw) is None
+
+
+def test_long_non_ascii_subject_is_folded_and_round_trips():
+    raw = _message()
+    head = raw.split(b"\r\n\r\n", 1)[0]
+    assert b"Subject: =?utf-8?" in head
+    subject = head[head.index(b"Subject: ") :].split(b"\r\nMIME-Version")[0]
+    assert all(len(line) <= 78 for line in subject.split(b"\r\n"))
+
+    parsed = email.message_from_bytes(raw, policy=policy.SMTP)
+    assert str(parsed["Subject"]) == SUBJECT
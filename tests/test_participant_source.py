@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+from participant_source import CSVSource, open_file_source
+
+RECORDS = [
+    {"name": "Ana", "email": "ana@x.org", "age": 30, "vip": True, "note": None},
+    {"name": "Bo", "email": "bo@x.org", "tags": ["a", "b"], "meta": {"seat": 12}},
+    {"name": "Cy", "email": "cy@x.org", "age": 41.5},
+]
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_jsonl_headers_come_from_every_line(tmp_path):
+    path = tmp_path / "people.jsonl"
+    _write_jsonl(path, RECORDS)
+    source = open_file_source(str(path))
+    assert source.headers == ["name", "email", "age", "vip", "note", "tags", "meta"]
+    rows = dict(source.iter_rows())
+    assert rows[2] == ["Ana", "ana@x.org", "30", "true", "", "", ""]
+    assert rows[3][5:] == ['["a", "b"]', '{"seat": 12}']
+
+
+def test_jsonl_commit_only_changes_updated_keys(tmp_path):
+    path = tmp_path / "people.jsonl"
+    _write_jsonl(path, RECORDS)
+    source = open_file_source(str(path))
+    uid_col = source.ensure_column("unique_id")
+    sent_col = source.ensure_column("email_sent")
+    source.write_cells(
+        {(2, uid_col): "id-1", (3, uid_col): "id-2", (3, sent_col): "yes"}
+    )
+    source.commit()
+
+    records = _read_jsonl(path)
+    assert records[0] == dict(RECORDS[0], unique_id="id-1")
+    assert records[1] == dict(RECORDS[1], unique_id="id-2", email_sent="yes")
+    assert records[2] == RECORDS[2]
+
+    reopened = open_file_source(str(path))
+    headers = reopened.headers
+    assert {"unique_id", "email_sent"} <= set(headers)
+    last_row = dict(reopened.iter_rows())[4]
+    assert last_row[headers.index("unique_id")] == ""
+    assert last_row[headers.index("email_sent")] == ""
+
+
+def test_jsonl_untouched_lines_are_kept_byte_for_byte(tmp_path):
+    path = tmp_path / "people.jsonl"
+    path.write_text(
+        '{"email": "a@x.org",  "n": 1.0}\n{"email": "b@x.org"}', encoding="utf-8"
+    )
+    source = open_file_source(str(path))
+    source.write_cells({(3, source.ensure_column("email_sent")): "yes"})
+    source.commit()
+    assert path.read_text(encoding="utf-8") == (
+        '{"email": "a@x.org",  "n": 1.0}\n{"email": "b@x.org", "email_sent": "yes"}\n'
+    )
+
+
+def test_csv_commit_adds_column(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("name,email\nAna,ana@x.org\nBo,bo@x.org\n", encoding="utf-8")
+    source = CSVSource(str(path))
+    source.write_cells({(3, source.ensure_column("email_sent")): "yes"})
+    source.commit()
+    assert path.read_text(encoding="utf-8").splitlines() == [
+        "name,email,email_sent",
+        "Ana,ana@x.org,",
+        "Bo,bo@x.org,yes",
+    ]
+
+
+def test_parquet_commit_keeps_schema(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    path = str(tmp_path / "people.parquet")
+    table = pa.table(
+        {
+            "name": ["Ana", "Bo", None],
+            "age": pa.array([30, None, 41], pa.int64()),
+            "vip": [True, False, None],
+            "checked_in_at": pa.array([None, None, None], pa.string()),
+        }
+    )
+    pq.write_table(table, path)
+
+    source = open_file_source(path)
+    source.batch_size = 2  # Updates land in both record batches
+    uid_col = source.ensure_column("unique_id")
+    source.write_cells(
+        {
+            (2, uid_col): "id-1",
+            (4, uid_col): "id-3",
+            (4, source.ensure_column("checked_in_at")): "2026-10-17T09:00:00",
+        }
+    )
+    source.commit()
+
+    written = pq.read_table(path)
+    assert written.schema.field("age").type == pa.int64()
+    assert written.schema.field("vip").type == pa.bool_()
+    assert written.column("name").to_pylist() == ["Ana", "Bo", None]
+    assert written.column("age").to_pylist() == [30, None, 41]
+    assert written.column("vip").to_pylist() == [True, False, None]
+    assert written.column("unique_id").to_pylist() == ["id-1", None, "id-3"]
+    assert written.column("checked_in_at").to_pylist() == [
+        None,
+        None,
+        "2026-10-17T09:00:00",
+    ]
+
+
+def test_parquet_rejects_values_that_do_not_fit_the_column(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    path = str(tmp_path / "people.parquet")
+    pq.write_table(pa.table({"email": ["a@x.org"], "email_sent": [False]}), path)
+    source = open_file_source(path)
+    source.write_cells({(2, 2): "yes"})
+    with pytest.raises(ValueError, match="email_sent"):
+        source.commit()
+    assert pq.read_table(path).column("email_sent").to_pylist() == [False]
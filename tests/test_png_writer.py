@@ -0,0 +1,26 @@
+import pytest
+
+import png_writer
+
+numpy = pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("box_size", [1, 3, 8, 10])
+@pytest.mark.parametrize("width", [21, 24, 29])
+def test_numpy_and_python_scanlines_agree(box_size, width):
+    rng = numpy.random.default_rng(width * box_size)
+    matrix = (rng.random((width, width)) < 0.5).tolist()
+
+    assert png_writer._scanlines_numpy(
+        matrix, box_size
+    ) == png_writer._scanlines_python(matrix, box_size)
+
+
+def test_encoding_does_not_depend_on_numpy(monkeypatch):
+    matrix = [[(x * y) % 3 == 0 for x in range(25)] for y in range(25)]
+    colors = ((0, 0, 0), (255, 255, 255))
+    with_numpy = png_writer.encode_png(matrix, 4, *colors)
+
+    monkeypatch.setattr(png_writer, "numpy", None)
+
+    assert png_writer.encode_png(matrix, 4, *colors) == with_numpy
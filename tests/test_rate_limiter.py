@@ -0,0 +1,67 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import QuotaExceeded, RateLimiter
+from send_journal import SendJournal
+
+
+def _job(number):
+    return SimpleNamespace(
+        row=number + 2, unique_id=f"id-{number}", recipient_email=f"p{number}@x.org"
+    )
+
+
+def _limiter(per_day):
+    return RateLimiter(rate=1000, burst=1000, per_day=per_day)
+
+
+def test_daily_quota_is_shared_across_runs(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with SendJournal(path) as journal:
+        for number in range(3):
+            journal.record(_job(number), "sent", 250)
+        journal.record(_job(3), "failed", 421, "busy")
+
+    # A new process reads the journal and only has 2 sends left today
+    with SendJournal(path) as journal:
+        limiter = _limiter(per_day=5)
+        limiter.seed_day(journal.sent_since(86400))
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(QuotaExceeded):
+        limiter.acquire()
+
+
+def test_sends_older_than_a_day_do_not_count():
+    limiter = _limiter(per_day=2)
+    limiter.seed_day([time.time() - 90000, time.time() - 86500])
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(QuotaExceeded):
+        limiter.acquire()
+
+
+def test_sent_since_skips_old_records(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    old = {"time": time.time() - 2 * 86400, "unique_id": "old", "row": 2}
+    old.update(recipient="old@x.org", attempt=1, status="sent")
+    path.write_text(json.dumps(old) + "\n", encoding="utf-8")
+    with SendJournal(str(path)) as journal:
+        journal.record(_job(1), "sent", 250)
+        assert journal.sent_count == 2
+        assert len(journal.sent_since(86400)) == 1
+
+
+def test_recent_sends_stay_bounded_to_a_minute(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: clock[0])
+    limiter = _limiter(per_day=None)
+    for _ in range(500):
+        limiter.acquire()
+        clock[0] += 1
+    assert len(limiter._recent) <= 61
+    assert 0.9 < limiter.observed_rate() <= 1.0
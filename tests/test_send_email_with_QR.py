@@ -0,0 +1,103 @@
+import csv
+import email
+import os
+
+import pytest
+
+import send_email_with_QR
+from generate_QR import find_qr_file, generate_qr_code, qr_filename
+from participant_source import CSVSource
+from smtp_pool import SMTPConnectionPool
+
+IDS = ["11111111-1111-4111-8111-111111111111", "22222222-2222-4222-8222-222222222222"]
+
+
+def qr_attachment(raw):
+    """(content type, filename) of the inline QR code in a sent message"""
+    for part in email.message_from_bytes(raw).walk():
+        if part["Content-ID"] == "<qr_code>":
+            return part.get_content_type(), part.get_filename()
+    return None
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, smtp_server):
+    """Two participants in a CSV, sending to the local SMTP server"""
+    handler, port = smtp_server
+    monkeypatch.chdir(tmp_path)
+    with open("participants.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "unique_id"])
+        writer.writerow(["Ana", "ana@x.org", IDS[0]])
+        writer.writerow(["Bo", "bo@x.org", IDS[1]])
+    os.makedirs("qr_codes")
+
+    monkeypatch.setattr(send_email_with_QR, "SEND_RATE_PER_SECOND", 1000)
+    monkeypatch.setattr(send_email_with_QR, "SEND_BURST", 100)
+    monkeypatch.setattr(
+        send_email_with_QR,
+        "create_smtp_pool",
+        lambda max_size=1: SMTPConnectionPool(
+            "127.0.0.1", port, "sender", "secret", use_tls=False, max_size=max_size
+        ),
+    )
+    return handler
+
+
+def _email_sent(path="participants.csv"):
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["unique_id"]: row["email_sent"] for row in csv.DictReader(f)}
+
+
+def test_find_qr_file_looks_for_every_format(tmp_path):
+    directory = str(tmp_path)
+    assert find_qr_file(IDS[0], directory) is None
+
+    generate_qr_code(IDS[0], qr_filename(IDS[0], "svg"), directory)
+    assert find_qr_file(IDS[0], directory).endswith(".svg")
+    assert find_qr_file(IDS[0], directory, "png") is None
+
+
+def test_sends_codes_generated_in_another_format(workspace):
+    for unique_id in IDS:
+        generate_qr_code(unique_id, qr_filename(unique_id, "svg"), "qr_codes")
+
+    assert send_email_with_QR.send_emails_with_qr_codes(
+        table=CSVSource("participants.csv")
+    )
+    assert [qr_attachment(raw)[0] for raw in workspace.received] == [
+        "image/svg+xml",
+        "image/svg+xml",
+    ]
+    assert _email_sent() == {IDS[0]: "yes", IDS[1]: "yes"}
+
+
+def test_missing_qr_code_fails_the_row(workspace):
+    generate_qr_code(IDS[0], qr_filename(IDS[0], "png"), "qr_codes")
+
+    ok = send_email_with_QR.send_emails_with_qr_codes(
+        table=CSVSource("participants.csv")
+    )
+
+    assert not ok
+    assert workspace.messages == 1
+    assert _email_sent() == {IDS[0]: "yes", IDS[1]: ""}
+    with open("failed_sends.csv", newline="", encoding="utf-8") as f:
+        (failure,) = csv.DictReader(f)
+    assert failure["unique_id"] == IDS[1]
+    assert failure["category"] == "permanent"
+    assert failure["attempts"] == "1"
+
+
+def test_format_option_picks_the_attachment(workspace):
+    for unique_id in IDS:
+        generate_qr_code(unique_id, qr_filename(unique_id, "png"), "qr_codes")
+        generate_qr_code(unique_id, qr_filename(unique_id, "pdf"), "qr_codes")
+
+    assert send_email_with_QR.send_emails_with_qr_codes(
+        table=CSVSource("participants.csv"), output_format="pdf"
+    )
+    assert qr_attachment(workspace.received[0]) == (
+        "application/pdf",
+        qr_filename(IDS[0], "pdf"),
+    )
@@ -0,0 +1,107 @@
+import pytest
+
+import sheet_writer
+from participant_table import ParticipantTable
+from sheet_writer import SheetWriteBuffer
+
+
+class FakeWorksheet:
+    """Worksheet double that counts API calls instead of making them"""
+
+    def __init__(self, rows=10):
+        self.values = [["name", "email", "email_sent"]] + [
+            [f"P{row}", f"p{row}@x.org", ""] for row in range(2, rows + 2)
+        ]
+        self.reads = 0
+        self.batch_updates = []
+
+    def get_all_values(self):
+        self.reads += 1
+        return [list(row) for row in self.values]
+
+    def batch_update(self, ranges):
+        self.batch_updates.append(ranges)
+
+    @property
+    def api_calls(self):
+        return self.reads + len(self.batch_updates)
+
+
+@pytest.fixture
+def sheet():
+    return FakeWorksheet()
+
+
+@pytest.fixture
+def table(sheet):
+    table = ParticipantTable(sheet)
+    table.values()
+    return table
+
+
+def test_flushes_once_size_threshold_is_reached(sheet, table):
+    writer = SheetWriteBuffer(table, flush_every=5, flush_interval=3600)
+    for row in range(2, 6):
+        writer.set(row, 3, "yes")
+    assert sheet.batch_updates == []
+    assert writer.pending_count == 4
+
+    writer.set(6, 3, "yes")
+    # Five consecutive rows in one column are a single range in one call
+    assert len(sheet.batch_updates) == 1
+    assert sheet.batch_updates[0] == [{"range": "C2:C6", "values": [["yes"]] * 5}]
+    assert writer.pending_count == 0
+    assert (writer.api_calls, writer.cells_written) == (1, 5)
+    assert table.values()[5][2] == "yes"  # Sheet row 6
+
+
+def test_flushes_once_interval_has_passed(sheet, table, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(sheet_writer.time, "monotonic", lambda: clock[0])
+    writer = SheetWriteBuffer(table, flush_every=100, flush_interval=10)
+
+    writer.set(2, 3, "yes")
+    clock[0] += 9
+    writer.set(3, 3, "yes")
+    writer.maybe_flush()
+    assert sheet.batch_updates == []
+
+    clock[0] += 1
+    writer.maybe_flush()
+    assert len(sheet.batch_updates) == 1
+    assert writer.cells_written == 2
+
+
+def test_flushes_on_exit(sheet, table):
+    with SheetWriteBuffer(table, flush_every=100, flush_interval=3600) as writer:
+        writer.set(2, 3, "yes")
+        writer.set(4, 3, "yes")
+        assert sheet.batch_updates == []
+    assert len(sheet.batch_updates) == 1
+    assert writer.pending_count == 0
+
+
+def test_flushes_on_exit_after_an_error(sheet, table):
+    with pytest.raises(KeyboardInterrupt):
+        with SheetWriteBuffer(table, flush_every=100, flush_interval=3600) as writer:
+            writer.set(2, 3, "yes")
+            raise KeyboardInterrupt
+    assert len(sheet.batch_updates) == 1
+
+
+def test_failed_flush_keeps_cells_for_retry(sheet, table):
+    writer = SheetWriteBuffer(table, flush_every=100, flush_interval=3600)
+    writer.set(2, 3, "yes")
+
+    def fail(ranges):
+        raise ConnectionError("offline")
+
+    sheet.batch_update = fail
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    assert writer.pending_count == 1
+
+    del sheet.batch_update
+    writer.flush()
+    assert len(sheet.batch_updates) == 1
+    assert sheet.api_calls == 2  # The initial read and one batch_update
@@ -0,0 +1,118 @@
+import json
+import time
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+
+import sheets_client
+from sheets_client import QuotaAwareTransport, SheetsMetrics
+
+
+def _response(status, body=None, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body or {}).encode()
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def _error(status, retry_after=None):
+    body = {"error": {"code": status, "message": "injected", "status": "ERR"}}
+    return APIError(_response(status, body, retry_after))
+
+
+class FakeTransport:
+    """Stand-in for gspread's request(): fails as scripted, then succeeds"""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = []
+
+    def __call__(self, method, endpoint, *args, **kwargs):
+        self.calls.append((time.monotonic(), method, endpoint))
+        if self.failures:
+            raise self.failures.pop(0)
+        return _response(200, {"values": [["ok"]]})
+
+
+def _transport(fake, **options):
+    options.setdefault("metrics", SheetsMetrics())
+    options.setdefault("base_delay", 0.05)
+    return QuotaAwareTransport(fake, reads_per_minute=600, **options)
+
+
+def test_retries_429_and_5xx_then_succeeds(capsys):
+    fake = FakeTransport(_error(429), _error(500), _error(503))
+    transport = _transport(fake)
+
+    response = transport("GET", "https://sheets/values")
+
+    assert response.status_code == 200
+    assert len(fake.calls) == 4
+    stats = transport.metrics
+    assert (stats.calls, stats.reads, stats.errors, stats.retries) == (1, 1, 3, 3)
+    assert stats.bytes_received == len(response.content)
+    assert "Sheets API error 429" in capsys.readouterr().out
+
+
+def test_retry_after_is_the_only_delay():
+    fake = FakeTransport(_error(429, retry_after=0.1), _error(429, retry_after=0.1))
+    transport = _transport(fake, base_delay=10)
+
+    started = time.monotonic()
+    transport("GET", "https://sheets/values")
+    elapsed = time.monotonic() - started
+
+    gaps = [later[0] - earlier[0] for earlier, later in zip(fake.calls, fake.calls[1:])]
+    assert all(0.09 <= gap < 0.5 for gap in gaps)
+    assert elapsed < 1.0
+    assert transport.metrics.retries == 2
+    assert transport.metrics.throttles == 2
+
+
+def test_exponential_backoff_without_retry_after(monkeypatch):
+    monkeypatch.setattr(sheets_client.random, "uniform", lambda low, high: 1.0)
+    fake = FakeTransport(_error(502), _error(502))
+    transport = _transport(fake, base_delay=0.05)
+
+    transport("GET", "https://sheets/values")
+
+    first, second = [
+        later[0] - earlier[0] for earlier, later in zip(fake.calls, fake.calls[1:])
+    ]
+    assert 0.045 <= first < 0.09
+    assert 0.095 <= second < 0.2
+
+
+def test_gives_up_after_max_attempts():
+    fake = FakeTransport(*[_error(503, retry_after=0) for _ in range(5)])
+    transport = _transport(fake, max_attempts=3)
+
+    with pytest.raises(APIError):
+        transport("GET", "https://sheets/values")
+    assert len(fake.calls) == 3
+    assert (transport.metrics.errors, transport.metrics.retries) == (3, 2)
+    assert transport.metrics.calls == 0
+
+
+def test_other_errors_are_not_retried():
+    fake = FakeTransport(_error(403))
+    transport = _transport(fake)
+
+    with pytest.raises(APIError):
+        transport("POST", "https://sheets/values:batchUpdate", json={"data": []})
+    assert len(fake.calls) == 1
+    assert (transport.metrics.errors, transport.metrics.retries) == (1, 0)
+
+
+def test_writes_are_counted_with_their_payload():
+    fake = FakeTransport()
+    transport = _transport(fake)
+    payload = {"data": [{"range": "C2", "values": [["yes"]]}]}
+
+    transport("POST", "https://sheets/values:batchUpdate", json=payload)
+
+    assert (transport.metrics.writes, transport.metrics.reads) == (1, 0)
+    assert transport.metrics.bytes_sent == len(json.dumps(payload))
@@ -0,0 +1,72 @@
+from email.message import EmailMessage
+
+from smtp_pool import SMTPConnectionPool
+
+
+def _message(number):
+    msg = EmailMessage()
+    msg["From"] = "sender@example.com"
+    msg["To"] = f"user{number}@example.com"
+    msg["Subject"] = f"Message {number}"
+    msg.set_content("Hello")
+    return msg
+
+
+def _pool(port, **options):
+    return SMTPConnectionPool(
+        "127.0.0.1", port, "sender@example.com", "secret", use_tls=False, **options
+    )
+
+
+def test_one_login_for_many_messages(smtp_server):
+    handler, port = smtp_server
+    with _pool(port, max_messages=100) as pool:
+        for number in range(10):
+            pool.send_message(_message(number))
+
+    assert handler.messages == 10
+    assert handler.sessions == 1
+    assert handler.logins == 1
+    assert pool.connections_opened == 1
+    assert pool.logins == 1
+    assert pool.messages_sent == 10
+
+
+def test_connection_recycled_after_max_messages(smtp_server):
+    handler, port = smtp_server
+    with _pool(port, max_messages=3) as pool:
+        for number in range(7):
+            pool.send_message(_message(number))
+
+    assert handler.messages == 7
+    assert handler.sessions == 3
+    assert handler.logins == 3
+    assert pool.connections_opened == 3
+
+
+def test_reconnects_and_resends_after_421(smtp_server):
+    handler, port = smtp_server
+    handler.disconnect_on = {3}
+    with _pool(port, max_messages=100) as pool:
+        for number in range(5):
+            pool.send_message(_message(number))
+
+    # The third message is answered 421, sent again on a new session
+    assert handler.messages == 5
+    assert handler.sessions == 2
+    assert handler.logins == 2
+    assert pool.messages_sent == 5
+
+
+def test_sendmail_bytes_share_the_session(smtp_server):
+    handler, port = smtp_server
+    with _pool(port) as pool:
+        for number in range(3):
+            pool.sendmail(
+                "sender@example.com",
+                [f"user{number}@example.com"],
+                _message(number).as_bytes(),
+            )
+
+    assert handler.messages == 3
+    assert handler.logins == 1
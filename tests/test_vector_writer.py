@@ -0,0 +1,33 @@
+import pytest
+
+from generate_QR import QR_SETTINGS, QRRenderer, qr_filename
+from vector_writer import module_runs
+from verify_QR import decode_modules, read_modules
+
+UNIQUE_ID = "11111111-1111-4111-8111-111111111111"
+
+
+def test_module_runs():
+    assert module_runs([]) == []
+    assert module_runs([False, False]) == []
+    assert module_runs([True, True, False, True, False, False, True]) == [
+        (0, 2),
+        (3, 1),
+        (6, 1),
+    ]
+
+
+@pytest.mark.parametrize("output_format", ["svg", "pdf"])
+@pytest.mark.parametrize("box_size", [1, 10])
+def test_vector_codes_read_back_module_for_module(tmp_path, output_format, box_size):
+    settings = dict(QR_SETTINGS, box_size=box_size, format=output_format)
+    renderer = QRRenderer(settings)
+    border = settings["border"]
+    matrix = renderer.encode(UNIQUE_ID).get_matrix()
+    path = tmp_path / qr_filename(UNIQUE_ID, output_format)
+    renderer.save(UNIQUE_ID, str(path))
+
+    modules = read_modules(str(path))
+
+    assert modules == [row[border:-border] for row in matrix[border:-border]]
+    assert decode_modules(modules)[0] == UNIQUE_ID
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from generate_QR import generate_qr_code, qr_filename
+from verify_QR import decode_qr_image, verify_qr_codes
+
+IDS = [
+    "11111111-1111-4111-8111-111111111111",
+    "22222222-2222-4222-8222-222222222222",
+    "33333333-3333-4333-8333-333333333333",
+]
+
+
+@pytest.mark.parametrize("backend", ["raw", "pil"])
+@pytest.mark.parametrize("output_format", ["png", "svg", "pdf"])
+def test_decodes_what_was_rendered(tmp_path, backend, output_format):
+    filename = qr_filename(IDS[0], output_format)
+    path = generate_qr_code(IDS[0], filename, str(tmp_path), backend, output_format)
+    assert decode_qr_image(path) == IDS[0]
+
+
+def test_report_lists_every_kind_of_problem(tmp_path):
+    directory = str(tmp_path)
+    generate_qr_code(IDS[0], qr_filename(IDS[0], "png"), directory)
+    # IDs[1]'s file holds another code, IDs[2] has none
+    generate_qr_code(IDS[0], qr_filename(IDS[1], "png"), directory)
+    generate_qr_code("orphan", qr_filename("orphan", "png"), directory)
+    with open(os.path.join(directory, "qr_broken.png"), "wb") as f:
+        f.write(b"not an image")
+    # Other formats are not checked
+    generate_qr_code(IDS[2], qr_filename(IDS[2], "svg"), directory)
+
+    report = verify_qr_codes(IDS, workers=1, output_dir=directory, output_format="png")
+
+    assert report["verified"] == 1
+    assert report["missing"] == [IDS[2]]
+    assert report["mismatched"] == [(qr_filename(IDS[1], "png"), IDS[1], IDS[0])]
+    assert report["orphaned"] == [qr_filename("orphan", "png")]
+    assert [name for name, _ in report["unreadable"]] == ["qr_broken.png"]
+    assert len(report["latencies"]) == 4
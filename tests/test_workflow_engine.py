@@ -0,0 +1,80 @@
+import email
+import os
+
+import pytest
+
+import send_email_with_QR
+import workflow_engine
+from participant_source import CSVSource
+from smtp_pool import SMTPConnectionPool
+from workflow_engine import run_workflow_pipeline
+
+
+@pytest.mark.parametrize(
+    "content", ["name,phone\nAna,123\n", "email,phone\nana@x.org,123\n", ""]
+)
+def test_unusable_sheet_is_left_untouched(tmp_path, monkeypatch, content):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "participants.csv"
+    path.write_text(content, encoding="utf-8")
+
+    pipeline = run_workflow_pipeline(CSVSource(str(path)))
+
+    assert pipeline.stop_reason == "invalid_sheet"
+    assert pipeline.sent_rows == [] and pipeline.ids_assigned == 0
+    assert path.read_text(encoding="utf-8") == content
+    assert os.listdir(tmp_path) == ["participants.csv"]
+
+
+@pytest.fixture
+def smtp_handler(tmp_path, monkeypatch, smtp_server):
+    """Run pipelines in tmp_path, sending to the local SMTP server"""
+    handler, port = smtp_server
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(send_email_with_QR, "SEND_RATE_PER_SECOND", 10000)
+    monkeypatch.setattr(send_email_with_QR, "SEND_BURST", 1000)
+    monkeypatch.setattr(
+        workflow_engine,
+        "create_smtp_pool",
+        lambda max_size=1: SMTPConnectionPool(
+            "127.0.0.1", port, "sender", "secret", use_tls=False, max_size=max_size
+        ),
+    )
+    return handler
+
+
+def test_pipeline_attaches_the_chosen_format(tmp_path, smtp_handler):
+    path = tmp_path / "participants.csv"
+    path.write_text("name,email\nAna,ana@x.org\nBo,bo@x.org\n", encoding="utf-8")
+
+    pipeline = run_workflow_pipeline(
+        CSVSource(str(path)), qr_workers=1, output_format="svg"
+    )
+
+    assert pipeline.succeeded
+    assert len(pipeline.sent_rows) == 2
+    types = {
+        part.get_content_type()
+        for raw in smtp_handler.received
+        for part in email.message_from_bytes(raw).walk()
+        if part["Content-ID"] == "<qr_code>"
+    }
+    assert types == {"image/svg+xml"}
+
+
+def test_local_file_is_rewritten_once_per_run(tmp_path, smtp_handler, monkeypatch):
+    monkeypatch.setattr(workflow_engine, "FIRST_ID_BATCH_ROWS", 4)
+    path = tmp_path / "participants.csv"
+    rows = [f"P{n},p{n}@x.org" for n in range(60)]
+    path.write_text("name,email\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    source = CSVSource(str(path))
+
+    pipeline = run_workflow_pipeline(source, qr_workers=1)
+
+    assert pipeline.succeeded and pipeline.ids_assigned == 60
+    assert source.commits == 1
+    reread = CSVSource(str(path))
+    uid_col = reread.headers.index("unique_id")
+    sent_col = reread.headers.index("email_sent")
+    for _, row in reread.iter_rows():
+        assert row[uid_col] and row[sent_col] == "yes"
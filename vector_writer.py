@@ -0,0 +1,100 @@
+import zlib
+
+
+def module_runs(row):
+    """(start, length) of each run of dark modules in a matrix row"""
+    runs = []
+    start = None
+    for x, dark in enumerate(row):
+        if dark and start is None:
+            start = x
+        elif not dark and start is not None:
+            runs.append((start, x - start))
+            start = None
+    if start is not None:
+        runs.append((start, len(row) - start))
+    return runs
+
+
+def _hex(rgb):
+    return "#%02x%02x%02x" % tuple(rgb)
+
+
+def encode_svg(matrix, box_size, fill_rgb, back_rgb):
+    """Encode a QR module matrix as a compact SVG
+
+    Coordinates are in modules (the viewBox), and the image is displayed
+    at `box_size` pixels per module. All dark modules form a single path
+    of one-module-wide horizontal strokes, one per run of adjacent dark
+    modules in a row: each row starts with an absolute move and every
+    further run in it costs only a relative move and a length.
+    """
+    count = len(matrix)
+    size = count * box_size
+    path = []
+    for y, row in enumerate(matrix):
+        end = None
+        for start, length in module_runs(row):
+            if end is None:
+                path.append(f"M{start} {y}.5h{length}")
+            else:
+                path.append(f"m{start - end} 0h{length}")
+            end = start + length
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">'
+        f'<rect width="{count}" height="{count}" fill="{_hex(back_rgb)}"/>'
+        f'<path stroke="{_hex(fill_rgb)}" d="{"".join(path)}"/></svg>\n'
+    ).encode("ascii")
+
+
+def _pdf_color(rgb):
+    return " ".join(f"{channel / 255:.3g}" for channel in rgb)
+
+
+def encode_pdf(matrix, box_size, fill_rgb, back_rgb):
+    """Encode a QR module matrix as a one-page vector PDF
+
+    The page is the size the PNG would be at 96 dpi. Each run of dark
+    modules in a row is one filled rectangle, in module units scaled by a
+    single transform; the content stream is deflated. There is no creation
+    date or ID, so the same matrix always gives the same bytes.
+    """
+    count = len(matrix)
+    scale = box_size * 0.75  # Pixels at 96 dpi to points
+    size = f"{count * scale:g}"
+    ops = [
+        f"{_pdf_color(back_rgb)} rg 0 0 {size} {size} re f",
+        f"{scale:g} 0 0 {scale:g} 0 0 cm {_pdf_color(fill_rgb)} rg",
+    ]
+    for y, row in enumerate(matrix):
+        for start, length in module_runs(row):
+            ops.append(f"{start} {count - 1 - y} {length} 1 re")
+    ops.append("f")
+    content = zlib.compress("\n".join(ops).encode("ascii"))
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {size} {size}] "
+        f"/Resources << >> /Contents 4 0 R >>".encode("ascii"),
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode("ascii")
+        + content
+        + b"\nendstream",
+    ]
+    out = [b"%PDF-1.4\n"]
+    offsets = []
+    position = len(out[0])
+    for number, body in enumerate(objects, start=1):
+        obj = f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+        offsets.append(position)
+        out.append(obj)
+        position += len(obj)
+    xref = [f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"]
+    xref += [f"{offset:010d} 00000 n \n" for offset in offsets]
+    xref.append(
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{position}\n%%EOF\n"
+    )
+    out.append("".join(xref).encode("ascii"))
+    return b"".join(out)
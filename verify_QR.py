@@ -0,0 +1,464 @@
+import argparse
+import functools
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+import gspread
+from PIL import Image
+from qrcode import util
+
+from generate_QR import (
+    OUTPUT_DIR,
+    QR_FORMAT,
+    QR_FORMATS,
+    QR_WORKERS,
+    SHEET_NAME,
+    SPREADSHEET_NAME,
+    authenticate_google_sheets,
+    print_generation_summary,
+    qr_filename,
+)
+from participant_source import open_configured_file_source
+from participant_table import ParticipantTable
+from sheets_client import metrics as sheets_metrics
+
+# Problems listed per category; the rest are only counted
+REPORT_LIMIT = 10
+
+# 15-bit format information -> (error correction, mask pattern); qrcode's
+# ERROR_CORRECT_* constants are the 2-bit codes the standard uses
+FORMAT_CODES = {
+    util.BCH_type_info((level << 3) | mask): (level, mask)
+    for level in range(4)
+    for mask in range(8)
+}
+
+
+def read_modules(path):
+    """Sample the module grid of a rendered QR image
+
+    Works on the clean, axis-aligned images this project writes: PNGs, and
+    the SVG and PDF files from vector_writer, read back module by module.
+    The border and module size are found from the top-left finder pattern.
+    Raises ValueError when the image does not look like a QR code.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".svg", ".pdf"):
+        with open(path, "rb") as f:
+            data = f.read()
+        grid = _svg_grid(data) if extension == ".svg" else _pdf_grid(data)
+        return _sample_modules(lambda x, y: grid[y][x], len(grid), len(grid))
+
+    with Image.open(path) as img:
+        img = img.convert("L")
+        width, height = img.size
+        pixels = img.load()
+    return _sample_modules(lambda x, y: pixels[x, y] < 128, width, height)
+
+
+def _svg_grid(data):
+    """Dark modules of an SVG drawn as row strokes by vector_writer"""
+    match = re.search(rb'viewBox="0 0 (\d+) \d+"', data)
+    path = re.search(rb' d="([^"]*)"', data)
+    if not match or not path:
+        raise ValueError("not a QR code SVG")
+    count = int(match.group(1))
+    grid = [[False] * count for _ in range(count)]
+    x = y = 0
+    for command, first, second in re.findall(
+        rb"([Mmh])(-?\d+)(?: (-?[\d.]+))?", path.group(1)
+    ):
+        if command == b"M":
+            x, y = int(first), int(float(second))
+        elif command == b"m":
+            x += int(first)
+        else:
+            for col in range(x, x + int(first)):
+                grid[y][col] = True
+            x += int(first)
+    return grid
+
+
+def _pdf_grid(data):
+    """Dark modules of a PDF drawn as row rectangles by vector_writer"""
+    stream = re.search(rb"stream\n(.*)\nendstream", data, re.DOTALL)
+    if not stream:
+        raise ValueError("not a QR code PDF")
+    content = zlib.decompress(stream.group(1)).decode("ascii")
+    page = re.search(r" 0 0 ([\d.]+) [\d.]+ re f", content)
+    scale = re.search(r"([\d.]+) 0 0 [\d.]+ 0 0 cm", content)
+    if not page or not scale:
+        raise ValueError("not a QR code PDF")
+    count = round(float(page.group(1)) / float(scale.group(1)))
+    grid = [[False] * count for _ in range(count)]
+    for x, y, width in re.findall(r"^(\d+) (\d+) (\d+) 1 re$", content, re.M):
+        for col in range(int(x), int(x) + int(width)):
+            grid[count - 1 - int(y)][col] = True
+    return grid
+
+
+def _sample_modules(dark, width, height):
+    if width != height:
+        raise ValueError(f"image is not square ({width}x{height})")
+
+    # The finder's outer corner is the first dark pixel on the diagonal
+    offset = next((i for i in range(width) if dark(i, i)), None)
+    if offset is None:
+        raise ValueError("no dark modules")
+    run = 0
+    while offset + run < width and dark(offset + run, offset):
+        run += 1
+    box, rest = divmod(run, 7)
+    count = (width - 2 * offset) // box if box else 0
+    if not box or rest or count * box != width - 2 * offset:
+        raise ValueError("finder pattern not found")
+    if count < 21 or count > 177 or (count - 17) % 4:
+        raise ValueError(f"{count} modules is not a QR code size")
+
+    centre = offset + box // 2
+    return [
+        [dark(centre + col * box, centre + row * box) for col in range(count)]
+        for row in range(count)
+    ]
+
+
+def decode_modules(modules):
+    """Decode a module grid to text; returns (text, version, level, mask)
+
+    Decoding does no error correction. Instead the text is encoded again
+    with the same parameters and must reproduce the grid exactly, so any
+    damaged module is reported rather than silently corrected.
+    """
+    count = len(modules)
+    version = (count - 17) // 4
+    level, mask = _read_format(modules)
+
+    fixed = _function_modules(version)
+    mask_func = util.mask_func(mask)
+    bits = []
+    upward = True
+    # Same zig-zag walk as qrcode's map_data
+    for col in range(count - 1, 0, -2):
+        if col <= 6:
+            col -= 1
+        rows = range(count - 1, -1, -1) if upward else range(count)
+        upward = not upward
+        for row in rows:
+            for c in (col, col - 1):
+                if not fixed[row][c]:
+                    bits.append(modules[row][c] != mask_func(row, c))
+
+    data = _deinterleave(_to_bytes(bits), version, level)
+    text = _read_segments(data, version)
+
+    qr = qrcode.QRCode(
+        version=version, error_correction=level, border=0, mask_pattern=mask
+    )
+    qr.add_data(text)
+    qr.make(fit=False)
+    if qr.get_matrix() != modules:
+        raise ValueError("error correction check failed")
+    return text, version, level, mask
+
+
+def decode_qr_image(path):
+    """Return the text stored in a QR image file"""
+    return decode_modules(read_modules(path))[0]
+
+
+def _read_format(modules):
+    count = len(modules)
+    vertical = horizontal = 0
+    for i in range(15):
+        row = i if i < 6 else i + 1 if i < 8 else count - 15 + i
+        col = count - i - 1 if i < 8 else 15 - i if i < 9 else 15 - i - 1
+        vertical |= modules[row][8] << i
+        horizontal |= modules[8][col] << i
+
+    for bits in (vertical, horizontal):
+        if bits in FORMAT_CODES:
+            return FORMAT_CODES[bits]
+    # Both copies damaged; take the nearest code if it is close enough
+    distance, code = min(
+        (bin(bits ^ code).count("1"), code)
+        for bits in (vertical, horizontal)
+        for code in FORMAT_CODES
+    )
+    if distance > 3:
+        raise ValueError("format information unreadable")
+    return FORMAT_CODES[code]
+
+
+@functools.lru_cache(maxsize=None)
+def _function_modules(version):
+    """Grid marking finder, timing, alignment, format and version modules"""
+    count = version * 4 + 17
+    fixed = [[False] * count for _ in range(count)]
+
+    def mark(top, bottom, left, right):
+        for row in range(top, bottom):
+            for col in range(left, right):
+                fixed[row][col] = True
+
+    # Finder patterns with their separators and the format information
+    mark(0, 9, 0, 9)
+    mark(0, 9, count - 8, count)
+    mark(count - 8, count, 0, 9)
+    for i in range(count):
+        fixed[6][i] = fixed[i][6] = True
+    positions = util.pattern_position(version)
+    finders = {(6, 6), (6, count - 7), (count - 7, 6)}
+    for row in positions:
+        for col in positions:
+            if (row, col) in finders:
+                continue  # Would overlap a finder pattern
+            mark(row - 2, row + 3, col - 2, col + 3)
+    if version >= 7:
+        mark(0, 6, count - 11, count - 8)
+        mark(count - 11, count - 8, 0, 6)
+    return fixed
+
+
+def _to_bytes(bits):
+    return bytes(
+        int("".join("1" if bit else "0" for bit in bits[i : i + 8]), 2)
+        for i in range(0, len(bits) - 7, 8)
+    )
+
+
+def _deinterleave(codewords, version, level):
+    """Data codewords of each RS block, concatenated in block order"""
+    blocks = qrcode.base.rs_blocks(version, level)
+    data = [[] for _ in blocks]
+    position = 0
+    for i in range(max(block.data_count for block in blocks)):
+        for block, chunk in zip(blocks, data):
+            if i < block.data_count:
+                chunk.append(codewords[position])
+                position += 1
+    return b"".join(bytes(chunk) for chunk in data)
+
+
+def _read_segments(data, version):
+    bits = "".join(f"{byte:08b}" for byte in data)
+    position = 0
+
+    def read(length):
+        nonlocal position
+        if position + length > len(bits):
+            raise ValueError("data runs past the end of the code")
+        value = int(bits[position : position + length], 2)
+        position += length
+        return value
+
+    parts = []
+    while len(bits) - position >= 4:
+        mode = read(4)
+        if mode == 0:
+            break
+        if mode not in (util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE):
+            raise ValueError(f"unsupported data mode {mode}")
+        length = read(util.length_in_bits(mode, version))
+        if mode == util.MODE_8BIT_BYTE:
+            parts.append(bytes(read(8) for _ in range(length)))
+        elif mode == util.MODE_ALPHA_NUM:
+            chars = []
+            for _ in range(length // 2):
+                pair = read(11)
+                chars.append(util.ALPHA_NUM[pair // 45])
+                chars.append(util.ALPHA_NUM[pair % 45])
+            if length % 2:
+                chars.append(util.ALPHA_NUM[read(6)])
+            parts.append(bytes(chars))
+        else:
+            digits = []
+            for _ in range(length // 3):
+                digits.append(f"{read(10):03d}")
+            if length % 3 == 2:
+                digits.append(f"{read(7):02d}")
+            elif length % 3 == 1:
+                digits.append(str(read(4)))
+            parts.append("".join(digits).encode("ascii"))
+    return b"".join(parts).decode("utf-8")
+
+
+def _decode_chunk(paths):
+    """Decode a list of image paths, timing each one"""
+    results = []
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            data, error = decode_qr_image(path), None
+        except Exception as e:
+            data, error = None, str(e) or type(e).__name__
+        seconds = time.perf_counter() - start
+        results.append((os.path.basename(path), data, error, seconds))
+    return results
+
+
+def decode_qr_images(paths, workers=None):
+    """Decode many images, in parallel when workers > 1
+
+    Returns (filename, text, error, seconds) tuples; text is None and
+    error says why when an image could not be decoded.
+    """
+    paths = list(paths)
+    workers = max(1, min(workers or QR_WORKERS, len(paths) or 1))
+    if workers == 1:
+        return _decode_chunk(paths)
+
+    chunksize = max(1, min(256, -(-len(paths) // (workers * 4))))
+    chunks = [paths[i : i + chunksize] for i in range(0, len(paths), chunksize)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(_decode_chunk, chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def verify_qr_codes(unique_ids, workers=None, output_dir=None, output_format=None):
+    """Check the images in `output_dir` against the sheet's unique IDs
+
+    Every image is decoded and looked up by filename in an index of the
+    IDs. Returns a report dict with lists for each kind of problem:
+    `missing` (IDs with no image), `orphaned` (images no ID maps to),
+    `mismatched` ((filename, expected, decoded) for images holding the
+    wrong text) and `unreadable` ((filename, reason)), plus `verified`
+    and the per-image decode `latencies`. Only files of `output_format`
+    (default QR_FORMAT) are checked.
+    """
+    output_dir = output_dir or OUTPUT_DIR
+    output_format = output_format or QR_FORMAT
+    expected = {}
+    for unique_id in dict.fromkeys(unique_ids):
+        expected.setdefault(qr_filename(unique_id, output_format), []).append(unique_id)
+    on_disk = sorted(
+        name
+        for name in os.listdir(output_dir)
+        if name.startswith("qr_") and name.endswith(f".{output_format}")
+    )
+
+    report = {
+        "missing": [],
+        "orphaned": [],
+        "mismatched": [],
+        "unreadable": [],
+        "verified": 0,
+        "latencies": [],
+    }
+    present = set(on_disk)
+    for filename, ids in expected.items():
+        if filename not in present:
+            report["missing"].extend(ids)
+
+    paths = [os.path.join(output_dir, name) for name in on_disk]
+    for filename, data, error, seconds in decode_qr_images(paths, workers):
+        report["latencies"].append(seconds)
+        ids = expected.get(filename)
+        if error is not None:
+            report["unreadable"].append((filename, error))
+        elif ids is None:
+            report["orphaned"].append(filename)
+        else:
+            for unique_id in ids:
+                if unique_id == data:
+                    report["verified"] += 1
+                else:
+                    report["mismatched"].append((filename, unique_id, data))
+    return report
+
+
+def print_verification_report(report, elapsed):
+    """Print the verification counts and the first problems of each kind"""
+    problems = (
+        ("missing", "❌ Missing images", lambda uid: uid),
+        ("orphaned", "🗑 Orphaned images", lambda name: name),
+        (
+            "mismatched",
+            "⚠️  Mismatched images",
+            lambda item: f"{item[0]}: expected {item[1]}, contains {item[2]}",
+        ),
+        ("unreadable", "✗ Unreadable images", lambda item: f"{item[0]}: {item[1]}"),
+    )
+    print(f"\n✓ Verified: {report['verified']}")
+    for key, title, describe in problems:
+        items = report[key]
+        if not items:
+            continue
+        print(f"{title}: {len(items)}")
+        for item in items[:REPORT_LIMIT]:
+            print(f"   {describe(item)}")
+        if len(items) > REPORT_LIMIT:
+            print(f"   ... and {len(items) - REPORT_LIMIT} more")
+    print_generation_summary(report["latencies"], elapsed)
+
+
+def verify_qr_codes_from_sheet(workers=None, table=None, output_format=None):
+    """Decode every QR image and check it against the sheet's unique IDs
+
+    Returns True when every ID has an image holding exactly that ID and
+    there are no orphaned or unreadable images.
+    """
+    sheets_usage = sheets_metrics.snapshot()
+    try:
+        if table is None:
+            table = open_configured_file_source()
+        if table is None:
+            client = authenticate_google_sheets()
+            spreadsheet = client.open(SPREADSHEET_NAME)
+            table = ParticipantTable(spreadsheet.worksheet(SHEET_NAME))
+
+        headers = table.headers
+        if "unique_id" not in headers:
+            print("Error: 'unique_id' column not found!")
+            return False
+        unique_id_col = headers.index("unique_id")
+        unique_ids = [
+            row_data[unique_id_col]
+            for _, row_data in table.iter_rows()
+            if unique_id_col < len(row_data) and row_data[unique_id_col]
+        ]
+
+        if not os.path.isdir(OUTPUT_DIR):
+            print(f"Error: '{OUTPUT_DIR}' directory not found!")
+            return False
+
+        print(f"Verifying QR codes in '{OUTPUT_DIR}' against {len(unique_ids)} IDs...")
+        start = time.perf_counter()
+        report = verify_qr_codes(unique_ids, workers, output_format=output_format)
+        print_verification_report(report, time.perf_counter() - start)
+        return not any(
+            report[key] for key in ("missing", "orphaned", "mismatched", "unreadable")
+        )
+
+    except gspread.exceptions.SpreadsheetNotFound:
+        print(f"Error: Spreadsheet '{SPREADSHEET_NAME}' not found.")
+    except gspread.exceptions.WorksheetNotFound:
+        print(f"Error: Sheet '{SHEET_NAME}' not found.")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+    finally:
+        sheets_metrics.print_summary(since=sheets_usage)
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify generated QR codes")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=QR_WORKERS,
+        help="number of decode processes (default: QR_WORKERS or CPU count)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(QR_FORMATS),
+        default=QR_FORMAT,
+        help="format of the files to check (default: QR_FORMAT or png)",
+    )
+    args = parser.parse_args()
+    verify_qr_codes_from_sheet(workers=args.workers, output_format=args.format)
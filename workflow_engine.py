@@ -0,0 +1,430 @@
+import asyncio
+import itertools
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from email_dispatcher import SendResult
+from generate_QR import QR_WORKERS, qr_filename, render_qr
+from generate_uniqueId import WRITE_CHUNK_ROWS, generate_unique_ids, short_key
+from rate_limiter import QuotaExceeded
+from retry_queue import classify_error
+from send_email_with_QR import (
+    QR_CODES_DIR,
+    SEND_JOURNAL_FSYNC_EVERY,
+    SEND_JOURNAL_PATH,
+    SEND_WORKERS,
+    SHEET_FLUSH_ROWS,
+    SHEET_FLUSH_SECONDS,
+    check_send_headers,
+    collect_send_jobs,
+    create_message_factory,
+    create_rate_limiter,
+    create_retry_policy,
+    create_smtp_pool,
+    find_send_columns,
+    send_job,
+    write_failure_report,
+)
+from send_journal import SendJournal
+from sheet_writer import SheetWriteBuffer
+
+# Load environment variables from .env.local
+load_dotenv(".env.local")
+
+# Also save the QR codes rendered in memory to QR_CODES_DIR
+STREAM_PERSIST_QR = os.getenv("STREAM_PERSIST_QR", "false").lower() == "true"
+# Send jobs waiting for a QR code; bounds how far ID assignment runs ahead
+WORKFLOW_QUEUE_SIZE = int(os.getenv("WORKFLOW_QUEUE_SIZE", "50"))
+# Rows in the first ID batch; later batches double up to WRITE_CHUNK_ROWS
+FIRST_ID_BATCH_ROWS = 100
+
+
+class WorkflowPipeline:
+    """Assign IDs, render QR codes and send emails as concurrent stages
+
+    The stages are connected by bounded asyncio queues, so the first email
+    goes out as soon as its row has an ID and a code instead of after
+    every row has been through every stage, and a slow stage holds the
+    faster ones back instead of letting work pile up in memory.
+
+    New IDs are written to the participant source (and committed) before
+    their rows are passed on, so an email never carries an ID the sheet
+    does not have. Blocking work runs in executors: QR rendering in a
+    process pool, SMTP sends in one thread per send worker and every
+    participant source call in a single thread, so they never overlap.
+    """
+
+    def __init__(
+        self,
+        table,
+        send_workers=None,
+        qr_workers=None,
+        persist_qr=False,
+        output_format=None,
+    ):
+        self.table = table
+        self.send_workers = max(1, send_workers or SEND_WORKERS)
+        self.qr_workers = max(1, qr_workers or QR_WORKERS)
+        self.persist_qr = persist_qr
+        self.output_format = output_format
+
+        self.ids_assigned = 0
+        self.codes_rendered = 0
+        self.sent_rows = []
+        self.skipped_rows = []
+        self.failures = []
+        self.retries = 0
+        self.started_at = None
+        self.first_sent_at = None
+        self.stop_reason = None
+        self._journaled_rows = []
+        self._in_flight = {}  # row -> SendJob handed to the SMTP threads
+
+        self._table_executor = ThreadPoolExecutor(max_workers=1)
+        self._send_executor = ThreadPoolExecutor(max_workers=self.send_workers)
+        self._render_executor = None
+        self._journal = None
+        self._pool = None
+        self._status_writer = None
+        self._main_task = None
+
+    def _on_table(self, func, *args):
+        """Run a participant source call on its dedicated thread"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._table_executor, func, *args)
+
+    async def run(self):
+        """Run every stage until all rows are handled or the run is stopped"""
+        self.started_at = time.monotonic()
+        self._main_task = asyncio.current_task()
+
+        # Check the sheet before adding any column to it; IDs come later
+        headers = await self._on_table(lambda: self.table.headers)
+        if not check_send_headers(headers, ("email", "name")):
+            self.stop_reason = "invalid_sheet"
+            return
+        unique_id_col = await self._on_table(self.table.ensure_column, "unique_id")
+        columns = await self._on_table(find_send_columns, self.table)
+        if columns is None:
+            self.stop_reason = "invalid_sheet"
+            return
+        self._required_cols, self._email_sent_col = columns
+        self._unique_id_col = unique_id_col
+
+        self._journal = SendJournal(SEND_JOURNAL_PATH, SEND_JOURNAL_FSYNC_EVERY)
+        self._limiter = create_rate_limiter(self._journal)
+        self._factory = create_message_factory()
+        self._retry_policy = create_retry_policy()
+        self._pool = create_smtp_pool(max_size=self.send_workers)
+        self._status_writer = SheetWriteBuffer(
+            self.table,
+            flush_every=SHEET_FLUSH_ROWS,
+            flush_interval=SHEET_FLUSH_SECONDS,
+        )
+        self._render_executor = ProcessPoolExecutor(
+            max_workers=self.qr_workers, initializer=_ignore_sigint
+        )
+        if self.persist_qr:
+            os.makedirs(QR_CODES_DIR, exist_ok=True)
+
+        self._render_queue = asyncio.Queue(maxsize=WORKFLOW_QUEUE_SIZE)
+        self._send_queue = asyncio.Queue(maxsize=self.send_workers * 2)
+
+        workers = [
+            asyncio.ensure_future(self._render_worker()) for _ in range(self.qr_workers)
+        ]
+        workers += [
+            asyncio.ensure_future(self._send_worker()) for _ in range(self.send_workers)
+        ]
+        finished = asyncio.ensure_future(self._run_stages())
+        try:
+            # A worker only finishes on its own if it crashed; surface that
+            done, _ = await asyncio.wait(
+                [finished] + workers, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+        except asyncio.CancelledError:
+            if self.stop_reason is None:
+                self.stop_reason = "interrupted"
+        finally:
+            for task in [finished] + workers:
+                task.cancel()
+            await asyncio.gather(finished, *workers, return_exceptions=True)
+
+    async def _run_stages(self):
+        await self._assign_ids()
+        await self._render_queue.join()
+        await self._send_queue.join()
+
+        # Catch the sheet up with sends only the journal knew about
+        for row in self._journaled_rows:
+            await self._on_table(
+                self._status_writer.set, row, self._email_sent_col, "yes"
+            )
+
+    def stop(self, reason):
+        """Stop the run after the current sends, e.g. when a quota is hit"""
+        self.stop_reason = reason
+        if self._main_task is not None:
+            self._main_task.cancel()
+
+    # Stage 1: unique IDs
+
+    async def _assign_ids(self):
+        col = self._unique_id_col
+        taken = await self._on_table(self._existing_short_keys, col)
+        rows = iter(self.table.iter_rows())
+        batch_size = FIRST_ID_BATCH_ROWS
+        index = itertools.count()
+
+        while True:
+            batch = await self._on_table(
+                lambda: list(itertools.islice(rows, batch_size))
+            )
+            if not batch:
+                break
+            batch_size = min(batch_size * 2, WRITE_CHUNK_ROWS)
+
+            updates = {}
+            missing = [row for row in batch if not _cell(row[1], col).strip()]
+            ids = generate_unique_ids(len(missing), taken=taken) if missing else []
+            for (row_idx, row_data), unique_id in zip(missing, ids):
+                if len(row_data) < col:
+                    row_data.extend([""] * (col - len(row_data)))
+                row_data[col - 1] = unique_id
+                updates[(row_idx, col)] = unique_id
+                print(f"🆔 Row {row_idx}: {unique_id}")
+
+            # Google Sheets stores the IDs before any of these rows can be
+            # emailed; a local file is rewritten once max_pending cells are
+            # buffered and when the run closes
+            if updates:
+                await self._on_table(self.table.write_cells, updates)
+                self.ids_assigned += len(updates)
+
+            jobs = collect_send_jobs(
+                self.table.headers,
+                batch,
+                self._required_cols,
+                self._email_sent_col,
+                self.skipped_rows,
+                self._journal,
+                self._journaled_rows,
+            )
+            for job in jobs:
+                await self._render_queue.put(job._replace(index=next(index)))
+
+    def _existing_short_keys(self, col):
+        return {
+            short_key(_cell(row_data, col).strip())
+            for _, row_data in self.table.iter_rows()
+            if _cell(row_data, col).strip()
+        }
+
+    # Stage 2: QR codes
+
+    async def _render_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._render_queue.get()
+            try:
+                qr_image_data = await loop.run_in_executor(
+                    self._render_executor, render_qr, job.unique_id, self.output_format
+                )
+                if self.persist_qr:
+                    path = os.path.join(
+                        QR_CODES_DIR, qr_filename(job.unique_id, self.output_format)
+                    )
+                    await loop.run_in_executor(None, _write_file, path, qr_image_data)
+                self.codes_rendered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed(SendResult(job, False, e, 0, "render"))
+            else:
+                await self._send_queue.put((job, qr_image_data, 0))
+            finally:
+                self._render_queue.task_done()
+
+    # Stage 3: emails
+
+    async def _send_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, qr_image_data, attempts = await self._send_queue.get()
+            attempts += 1
+            requeued = False
+            self._in_flight[job.row] = job
+            try:
+                await loop.run_in_executor(
+                    self._send_executor,
+                    send_job,
+                    job,
+                    qr_image_data,
+                    self._pool,
+                    self._limiter,
+                    self._factory,
+                    self._journal,
+                    qr_filename(job.unique_id, self.output_format),
+                )
+            except asyncio.CancelledError:
+                raise
+            except QuotaExceeded as e:
+                print(f"⏸ {e}; remaining rows left for the next run")
+                self.stop("quota")
+            except Exception as e:
+                category = classify_error(e)
+                if self._retry_policy.should_retry(category, attempts):
+                    self.retries += 1
+                    delay = self._retry_policy.delay(attempts)
+                    asyncio.ensure_future(
+                        self._requeue((job, qr_image_data, attempts), delay)
+                    )
+                    requeued = True
+                else:
+                    self._failed(SendResult(job, False, e, attempts, category))
+            else:
+                await self._sent(job)
+            finally:
+                # A requeued job stays unfinished until it is queued again
+                if not requeued:
+                    self._send_queue.task_done()
+
+    async def _requeue(self, item, delay):
+        try:
+            await asyncio.sleep(delay)
+            await self._send_queue.put(item)
+        finally:
+            self._send_queue.task_done()
+
+    async def _sent(self, job):
+        self._in_flight.pop(job.row, None)
+        if self.first_sent_at is None:
+            self.first_sent_at = time.monotonic()
+        self.sent_rows.append(job.row)
+        print(
+            f"✓ Row {job.row}: Sent to {job.recipient_email} "
+            f"({self._limiter.observed_rate():.2f}/s, "
+            f"limit {self._limiter.current_rate:.2f}/s)"
+        )
+        await self._on_table(
+            self._status_writer.set, job.row, self._email_sent_col, "yes"
+        )
+
+    def _failed(self, result):
+        job = result.job
+        self._in_flight.pop(job.row, None)
+        print(
+            f"✗ Row {job.row}: Failed to send to {job.recipient_email} after "
+            f"{result.attempts} attempt(s) ({result.category}): {result.error}"
+        )
+        self.failures.append(result)
+
+    def close(self):
+        """Wait for in-flight sends, then save statuses and release resources
+
+        Runs outside the event loop so an interrupted run still records
+        every email the server accepted.
+        """
+        try:
+            self._send_executor.shutdown(wait=True)
+        except KeyboardInterrupt:
+            # A second Ctrl-C: the send journal still has every acceptance
+            print("\n⚠️  Not waiting for emails in flight")
+        if self._render_executor is not None:
+            self._render_executor.shutdown(wait=True)
+
+        def finish():
+            if self._status_writer is not None:
+                # Sends that completed after the run was stopped
+                for row, job in self._in_flight.items():
+                    if self._journal.is_sent(job.unique_id, job.recipient_email):
+                        self._status_writer.set(row, self._email_sent_col, "yes")
+                        self.sent_rows.append(row)
+                self._status_writer.flush()
+            self.table.commit()
+
+        try:
+            self._table_executor.submit(finish).result()
+        finally:
+            self._table_executor.shutdown(wait=True)
+            if self._journal is not None:
+                self._journal.close()
+            if self._pool is not None:
+                self._pool.close()
+
+    @property
+    def succeeded(self):
+        """Whether the run got going and finished without stopping or failures"""
+        return (
+            self._status_writer is not None
+            and self.stop_reason is None
+            and not self.failures
+        )
+
+    def print_summary(self):
+        if self._status_writer is None:
+            return
+        elapsed = time.monotonic() - (self.started_at or time.monotonic())
+        print(f"\n🆔 IDs assigned: {self.ids_assigned}")
+        print(f"📱 QR codes rendered: {self.codes_rendered}")
+        print(f"✓ Emails sent: {len(self.sent_rows)}")
+        print(f"⊘ Emails skipped: {len(self.skipped_rows)}")
+        if self.retries:
+            print(f"↻ Retries after transient failures: {self.retries}")
+        if self.failures:
+            report_path = write_failure_report(self.failures)
+            rows = sorted(result.job.row for result in self.failures)
+            print(f"✗ Emails failed: {len(self.failures)} (rows {rows})")
+            print(f"📄 Failure report written to {report_path}")
+        if self.first_sent_at is not None:
+            first = self.first_sent_at - self.started_at
+            print(f"⏱ First email sent after {first:.1f}s")
+        print(f"⏱ Total time: {elapsed:.1f}s")
+        print(
+            f"📝 Sheet status updates: {self._status_writer.cells_written} "
+            f"rows in {self._status_writer.api_calls} API call(s)"
+        )
+
+
+def _ignore_sigint():
+    # Ctrl-C reaches the whole process group; let the parent stop renders
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _cell(row_data, col):
+    return row_data[col - 1] if col <= len(row_data) else ""
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def run_workflow_pipeline(
+    table, send_workers=None, qr_workers=None, persist_qr=False, output_format=None
+):
+    """Run the pipelined workflow; returns the finished WorkflowPipeline
+
+    Ctrl-C stops the stages, waits for emails already handed to the SMTP
+    server and saves their status before returning.
+    """
+    pipeline = WorkflowPipeline(
+        table, send_workers, qr_workers, persist_qr, output_format
+    )
+    try:
+        asyncio.run(pipeline.run())
+    except KeyboardInterrupt:
+        pipeline.stop_reason = "interrupted"
+    finally:
+        pipeline.close()
+
+    if pipeline.stop_reason == "interrupted":
+        print("\n⏹ Workflow interrupted; finished sends were saved")
+    pipeline.print_summary()
+    return pipeline